@@ -0,0 +1,108 @@
+"""Memory-mapped columnar price history: one file of doubles per column and an index of the rows of every
+(asin, client). Requires the optional numpy and pandas packages."""
+
+import json
+import os
+import re
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+HISTORY_COLUMNS = ["timestamp", "current_price", "price_regular"]
+INDEX_NAME = "index.json"
+
+_DTYPE = np.dtype("<f8")
+_COLUMN_FILE = re.compile(r"^(\w+)-(\d+)\.f8$")
+
+
+def write_history(frame: pd.DataFrame, directory: str) -> int:
+    """Writes the observations of a frame of the analytics module (see price_analytics.load_partitions) into the
+    columnar layout and returns the number of rows. Every write creates a new generation of column files and then
+    replaces the index, so a reader either sees the old or the new history. Column files older than the previous
+    generation are removed."""
+    os.makedirs(directory, exist_ok=True)
+    generation = _read_generation(directory) + 1
+    asins = frame["asin"].astype("string").fillna("").to_numpy(dtype=object)
+    clients = frame["client"].astype("string").to_numpy(dtype=object)
+    timestamps = frame["timestamp"]
+    if pd.api.types.is_datetime64_any_dtype(timestamps):
+        timestamps = timestamps.astype("datetime64[us, UTC]").astype("int64") / 1e6
+    columns = {
+        "timestamp": np.asarray(timestamps, dtype=_DTYPE),
+        "current_price": frame["current_price"].to_numpy(dtype=_DTYPE, na_value=np.nan),
+        "price_regular": frame["price_regular"].to_numpy(dtype=_DTYPE, na_value=np.nan),
+    }
+    order = np.lexsort((columns["timestamp"], clients, asins))
+    asins, clients = asins[order], clients[order]
+
+    changed = (asins[1:] != asins[:-1]) | (clients[1:] != clients[:-1])
+    starts = np.flatnonzero(np.r_[True, changed]) if len(order) else np.array([], dtype=np.int64)
+    lengths = np.diff(np.r_[starts, len(order)])
+    series = {asins[start] + "|" + clients[start]: [int(start), int(length)] for start, length in zip(starts, lengths)}
+
+    files = {name: "%s-%d.f8" % (name, generation) for name in HISTORY_COLUMNS}
+    for name, file_name in files.items():
+        with open(os.path.join(directory, file_name), "wb") as file:
+            columns[name][order].astype(_DTYPE).tofile(file)
+            file.flush()
+            os.fsync(file.fileno())
+    index = {"rows": int(len(order)), "generation": generation, "files": files, "series": series}
+    with open(os.path.join(directory, INDEX_NAME + ".tmp"), "w", encoding="utf-8") as file:
+        json.dump(index, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(os.path.join(directory, INDEX_NAME + ".tmp"), os.path.join(directory, INDEX_NAME))
+    _remove_generations(directory, generation - 1)
+    return index["rows"]
+
+
+def _read_generation(directory: str) -> int:
+    try:
+        with open(os.path.join(directory, INDEX_NAME), "r", encoding="utf-8") as file:
+            return json.load(file).get("generation", 0)
+    except FileNotFoundError:
+        return 0
+
+
+def _remove_generations(directory: str, oldest: int) -> None:
+    """Removes the column files of the generations before oldest. Readers that still map them keep their data"""
+    for file_name in os.listdir(directory):
+        match = _COLUMN_FILE.match(file_name)
+        if match and int(match.group(2)) < oldest:
+            os.remove(os.path.join(directory, file_name))
+
+
+class ColumnarHistory:
+    """Read access to a columnar history directory via memory-mapped arrays."""
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, INDEX_NAME), "r", encoding="utf-8") as file:
+            index = json.load(file)
+        self.rows = index["rows"]
+        self.index: Dict[str, List[int]] = index["series"]
+        self.generation = index["generation"]
+        self.columns = {}
+        for name, file_name in index["files"].items():
+            if self.rows:
+                self.columns[name] = np.memmap(os.path.join(directory, file_name), dtype=_DTYPE, mode="r",
+                                               shape=(self.rows,))
+            else:
+                self.columns[name] = np.empty(0, dtype=_DTYPE)
+
+    def keys(self) -> List[Tuple[str, str]]:
+        """Returns the (asin, client) keys of the history"""
+        return [tuple(key.split("|", 1)) for key in self.index]
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        return "|".join(key) in self.index
+
+    def column(self, name: str, asin: str, client: str) -> np.ndarray:
+        """Returns a read-only view of one column of the series of the asin on the client. Unknown products
+        return an empty array"""
+        start, length = self.index.get(asin + "|" + client, (0, 0))
+        return self.columns[name][start:start + length]
+
+    def series(self, asin: str, client: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the timestamps and current prices of the asin on the client as views, sorted by time"""
+        return self.column("timestamp", asin, client), self.column("current_price", asin, client)
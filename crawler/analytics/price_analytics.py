@@ -0,0 +1,132 @@
+"""Vectorised analyses of the stored output with pandas: price series, price differences between clients, discount
+frequency and rolling statistics. Requires the optional numpy and pandas packages."""
+
+import os
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from crawler.persistence.compaction import LocalObjectStore, list_data_files
+from crawler.persistence.partitioning import parse_partition
+from crawler.persistence.rolling_sink import segment_client
+
+ANALYSIS_COLUMNS = [
+    "timestamp",
+    "asin",
+    "client",
+    "current_price",
+    "price_regular",
+    "discount_in_euros",
+    "percent_discount",
+]
+
+_PRICE_COLUMNS = ["current_price", "price_regular", "discount_in_euros", "percent_discount"]
+
+
+def _normalize(frame: pd.DataFrame, client: str) -> pd.DataFrame:
+    """Brings the columns of a loaded file into the layout of ANALYSIS_COLUMNS"""
+    frame = frame.reindex(columns=[column for column in ANALYSIS_COLUMNS if column != "client"])
+    if not pd.api.types.is_datetime64_any_dtype(frame["timestamp"]):
+        frame["timestamp"] = pd.to_datetime(frame["timestamp"], unit="s", utc=True)
+    frame["timestamp"] = frame["timestamp"].astype("datetime64[us, UTC]")
+    for column in _PRICE_COLUMNS:
+        frame[column] = pd.to_numeric(frame[column], errors="coerce").astype(np.float64)
+    frame["asin"] = frame["asin"].astype("string")
+    frame["client"] = client
+    return frame[ANALYSIS_COLUMNS]
+
+
+def _combine(frames: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    frames = list(frames)
+    if not frames:
+        frame = pd.DataFrame({column: pd.Series(dtype=np.float64) for column in _PRICE_COLUMNS})
+        frame["timestamp"] = pd.Series(dtype="datetime64[us, UTC]")
+        frame["asin"] = pd.Series(dtype="string")
+        frame["client"] = pd.Series(dtype="string")
+        frames = [frame[ANALYSIS_COLUMNS]]
+    frame = pd.concat(frames, ignore_index=True)
+    frame["asin"] = frame["asin"].astype("category")
+    frame["client"] = frame["client"].astype("category")
+    return frame
+
+
+def load_csv(path: str, client: str = None) -> pd.DataFrame:
+    """Loads a csv output file (also gzip or zstd compressed segments). Without client the client is taken from
+    the file name, e.g. ../output/linux.csv or the segment ../output/linux-2022-05-09-001.csv.gz"""
+    if client is None:
+        file_name = os.path.basename(path)
+        client = segment_client(file_name) or file_name.split(".")[0]
+    columns = [column for column in ANALYSIS_COLUMNS if column != "client"]
+    frame = pd.read_csv(path, usecols=lambda column: column in columns)
+    return _combine([_normalize(frame, client)])
+
+
+def load_parquet(path: str, client: str) -> pd.DataFrame:
+    """Loads a parquet output file"""
+    columns = [column for column in ANALYSIS_COLUMNS if column != "client"]
+    return _combine([_normalize(pd.read_parquet(path, columns=columns), client)])
+
+
+def load_partitions(directory: str, prefix: str = "products") -> pd.DataFrame:
+    """Loads the partitioned output below a local directory. Compacted dates are read from their compacted files"""
+    store = LocalObjectStore(directory)
+    columns = [column for column in ANALYSIS_COLUMNS if column != "client"]
+    partitions = sorted({(values["client"], values["date"]) for values in map(parse_partition, store.list(prefix))
+                         if "client" in values and "date" in values})
+    frames = []
+    for client, date in partitions:
+        for key in list_data_files(store, prefix, client, date):
+            path = os.path.join(directory, key)
+            if key.endswith(".parquet"):
+                frame = pd.read_parquet(path, columns=columns)
+            else:
+                frame = pd.read_csv(path, usecols=lambda column: column in columns)
+            frames.append(_normalize(frame, client))
+    return _combine(frames)
+
+
+def price_series(frame: pd.DataFrame, asin: str = None, client: str = None) -> pd.DataFrame:
+    """Returns the current price and the regular price by asin, client and timestamp, sorted by time"""
+    selected = np.ones(len(frame), dtype=bool)
+    if asin is not None:
+        selected &= (frame["asin"] == asin).to_numpy()
+    if client is not None:
+        selected &= (frame["client"] == client).to_numpy()
+    series = frame.loc[selected, ["asin", "client", "timestamp", "current_price", "price_regular"]]
+    series = series.sort_values(["asin", "client", "timestamp"], kind="stable")
+    return series.set_index(["asin", "client", "timestamp"])
+
+
+def device_price_deltas(frame: pd.DataFrame, base_client: str, freq: str = "1h") -> pd.DataFrame:
+    """Returns the mean current price of every client minus the price of base_client per asin and time bucket of
+    length freq. There is one column per client, buckets without a price of both clients are NaN"""
+    buckets = frame.assign(bucket=frame["timestamp"].dt.floor(freq))
+    prices = buckets.pivot_table(index=["asin", "bucket"], columns="client", values="current_price",
+                                 aggfunc="mean", observed=True)
+    if base_client not in prices.columns:
+        raise KeyError("No prices of the client " + base_client)
+    deltas = prices.sub(prices[base_client], axis=0).drop(columns=base_client)
+    deltas.columns = deltas.columns.astype(str)
+    return deltas
+
+
+def discount_frequency(frame: pd.DataFrame) -> pd.DataFrame:
+    """Returns per asin and client the number of observations, the number of discounted observations and their
+    share. An observation is discounted if the current price is below the regular price or a discount is given"""
+    discounted = ((frame["current_price"] < frame["price_regular"]) | (frame["discount_in_euros"] > 0)
+                  | (frame["percent_discount"] > 0))
+    grouped = frame.assign(discounted=discounted).groupby(["asin", "client"], observed=True)["discounted"]
+    return pd.DataFrame({
+        "observations": grouped.size(),
+        "discounted": grouped.sum(),
+        "frequency": grouped.mean(),
+    })
+
+
+def rolling_statistics(frame: pd.DataFrame, window: str = "7D") -> pd.DataFrame:
+    """Returns the mean, min, max and standard deviation of the current price over a rolling time window per asin
+    and client, indexed by asin, client and timestamp"""
+    ordered = frame.sort_values(["asin", "client", "timestamp"], kind="stable").set_index("timestamp")
+    rolling = ordered.groupby(["asin", "client"], observed=True)["current_price"].rolling(window)
+    return rolling.agg(["mean", "min", "max", "std"])
@@ -0,0 +1,8 @@
+from crawler.exceptions.crawlerException import CrawlerError
+
+
+class CompactionError(CrawlerError):
+    def __init__(self, message="Kompaktierung fehlgeschlagen!"):
+        super().__init__(message)
+        print('Kompaktierung fehlgeschlagen!')
+    pass
@@ -1,62 +1,94 @@
 """The item factory parses the passed html text and extracts the desired attributes. The attributes are then stored in a
-dictionary and returned."""
+dictionary and returned. The html can be passed as raw bytes (as the proxy service returns it), then it is parsed
+without decoding it first; the encoding is taken from the header or the meta tag of the page."""
 
+import codecs
 import locale
 import logging
 import re
 import time
 from datetime import datetime
-from io import StringIO
+from typing import Optional, Union
 
 from lxml import etree
 
+from crawler.item_factory.product_record import ProductRecord
 from crawler.logging.decorator import decorator_for_logging
 
+META_SNIFF_BYTES = 4096
+META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?([A-Za-z0-9_.:-]+)""", re.IGNORECASE)
+
 
 @decorator_for_logging
-def create_item(html: str, url: str) -> dict:
+def create_item(html: Union[str, bytes], url: str, encoding: Optional[str] = None) -> dict:
     """The dictionary contains the attributes as name:value pairs. The value is generated by a method call.
     The individual methods receive the html text. Select the correct values using the appropriate html tags.
     Validate whether the values make any sense at all and, if necessary, transform the values to get the
     desired return value."""
 
-    logging.debug("Calling the create_item function")
+    return create_record(html, url, encoding).to_dict()
+
+
+@decorator_for_logging
+def create_record(html: Union[str, bytes], url: str, encoding: Optional[str] = None) -> ProductRecord:
+    """Same as create_item, but returns the attributes as compact ProductRecord, which is what the store module
+    consumes. encoding is the charset declared in the header of the response, if any. Values that do not have the
+    type of their field are stored as None."""
+
+    logging.debug("Calling the create_record function")
 
     datetime_now = datetime.now()
 
-    parser = etree.HTMLParser()
-    tree = etree.parse(StringIO(html), parser)
+    if isinstance(html, bytes):
+        parser = etree.HTMLParser(encoding=_sniff_encoding(html, encoding))
+    else:
+        parser = etree.HTMLParser()
+    tree = etree.ElementTree(etree.fromstring(html, parser))
 
     logging.debug("Tree is created from the parsed html")
 
-    dic = {
-        "name": _get_name(tree),
-        "current_price": _get_current_price(tree),
-        "price_regular": _get_regular_price(tree),
-        "prime": _get_prime(tree),
-        "discount_in_euros": _get_discount_in_euros(tree),
-        "percent_discount": _get_percent_discount(tree),
-        "sold_by_amazon": _get_sold_by_amazon(tree),
-        "seller": _get_seller(tree),
-        "brand": _get_brand(tree),
-        "shipping": _get_shipping(tree),
-        "amazon_choice": _get_amazon_choice(tree),
-        "amazon_choice_for": _get_amazon_choice_for(tree),
-        "asin": _get_asin(tree),
-        "product_id": _get_product_id(tree),
-        "manufacturer": _get_manufacturer(tree),
-        "country_of_origin": _get_country_of_origin(tree),
-        "product_dimensions": _get_product_dimensions(tree),
-        "number_of_reviews": _get_number_of_reviews(tree),
-        "review_score": _get_review_score(tree),
-        "on_sale_since": _get_on_sale_since(tree),
-        "url": _get_url(url),
-        "timestamp": _get_timestamp(datetime_now),
-        "date": _get_date(datetime_now),
-        "time": _get_time(datetime_now),
-    }
-
-    return dic
+    return ProductRecord.typed(
+        timestamp=_get_timestamp(datetime_now),
+        name=_get_name(tree),
+        current_price=_get_current_price(tree),
+        price_regular=_get_regular_price(tree),
+        prime=_get_prime(tree),
+        discount_in_euros=_get_discount_in_euros(tree),
+        percent_discount=_get_percent_discount(tree),
+        sold_by_amazon=_get_sold_by_amazon(tree),
+        seller=_get_seller(tree),
+        brand=_get_brand(tree),
+        shipping=_get_shipping(tree),
+        amazon_choice=_get_amazon_choice(tree),
+        amazon_choice_for=_get_amazon_choice_for(tree),
+        asin=_get_asin(tree),
+        product_id=_get_product_id(tree),
+        manufacturer=_get_manufacturer(tree),
+        country_of_origin=_get_country_of_origin(tree),
+        product_dimensions=_get_product_dimensions(tree),
+        number_of_reviews=_get_number_of_reviews(tree),
+        review_score=_get_review_score(tree),
+        on_sale_since=_get_on_sale_since(tree),
+        url=_get_url(url),
+    )
+
+
+def _sniff_encoding(html: bytes, declared: Optional[str]) -> str:
+    """Returns the encoding of the html: the one declared in the header, else the one of the meta tag in the first
+    META_SNIFF_BYTES bytes, else utf-8. The body itself is never analysed."""
+    candidates = [declared]
+    match = META_CHARSET.search(html, 0, META_SNIFF_BYTES)
+    if match is not None:
+        candidates.append(match.group(1).decode("ascii"))
+    for candidate in candidates:
+        if not candidate:
+            continue
+        try:
+            codecs.lookup(candidate)
+            return candidate
+        except LookupError:
+            logging.warning("Unknown encoding %s of the html", candidate)
+    return "utf-8"
 
 
 @decorator_for_logging
@@ -145,22 +177,6 @@ def _get_sold_by_amazon(tree: etree) -> bool:
     return None
 
 
-@decorator_for_logging
-def _get_date(datetime_now: datetime) -> str:
-    """Returns the date part of the given datetime"""
-
-    date = datetime_now.strftime("%Y-%m-%d")
-    return date
-
-
-@decorator_for_logging
-def _get_time(datetime_now: datetime) -> str:
-    """Returns the time part of the given datetime"""
-
-    current_time = datetime_now.strftime("%H:%M:%S")
-    return current_time
-
-
 @decorator_for_logging
 def _get_timestamp(datetime_now: datetime) -> float:
     """Returns the unix timestamp of the given datetime"""
@@ -543,7 +559,7 @@ def _get_number_of_reviews(tree: etree):
 
 
 @decorator_for_logging
-def _get_review_score(tree: etree):
+def _get_review_score(tree: etree) -> float:
     """select, validate and transform the item review_score from the given html-tree"""
 
     span_tag = tree.find('.//span[@id = "acrPopover"]')
@@ -554,9 +570,9 @@ def _get_review_score(tree: etree):
         review_score: str = span_tag.attrib["title"].split(" ")[0]
 
         if (re.match(r"[0-9],[0-9]", review_score)) and (review_score is not None):
-            return review_score
+            return float(review_score.replace(",", "."))
         return None
-    except(TypeError, AttributeError, IndexError):
+    except(TypeError, AttributeError, IndexError, ValueError):
         logging.warning("Can not parse item review_score")
 
     return None
@@ -0,0 +1,135 @@
+"""Compact, typed representation of a scraped product. A ProductRecord has one slot per attribute, a ProductBatch
+collects many records column by column for the store backends."""
+
+import logging
+from array import array
+from datetime import datetime
+from math import isnan
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+
+class ProductRecord(NamedTuple):
+    """One observation of an amazon product at a point in time."""
+
+    timestamp: float
+    name: Optional[str] = None
+    current_price: Optional[float] = None
+    price_regular: Optional[float] = None
+    prime: Optional[bool] = None
+    discount_in_euros: Optional[float] = None
+    percent_discount: Optional[float] = None
+    sold_by_amazon: Optional[bool] = None
+    seller: Optional[str] = None
+    brand: Optional[str] = None
+    shipping: Optional[float] = None
+    amazon_choice: Optional[bool] = None
+    amazon_choice_for: Optional[str] = None
+    asin: Optional[str] = None
+    product_id: Optional[str] = None
+    manufacturer: Optional[str] = None
+    country_of_origin: Optional[str] = None
+    product_dimensions: Optional[str] = None
+    number_of_reviews: Optional[int] = None
+    review_score: Optional[float] = None
+    on_sale_since: Optional[str] = None
+    url: Optional[str] = None
+
+    @property
+    def date(self) -> str:
+        """Returns the date part of the timestamp"""
+        return datetime.fromtimestamp(self.timestamp).strftime("%Y-%m-%d")
+
+    @property
+    def time(self) -> str:
+        """Returns the time part of the timestamp"""
+        return datetime.fromtimestamp(self.timestamp).strftime("%H:%M:%S")
+
+    def to_dict(self) -> dict:
+        """Returns the record in the dictionary form create_item has always returned"""
+        dic = self._asdict()
+        dic["date"] = self.date
+        dic["time"] = self.time
+        return dic
+
+    @classmethod
+    def typed(cls, **values) -> "ProductRecord":
+        """Creates a record whose values have the declared field types. Ints are converted to floats (and integral
+        floats to ints), values of any other type are replaced by None, e.g. False for a missing string."""
+        return cls(**{field: _typed_value(field, value) for field, value in values.items()})
+
+    @classmethod
+    def from_dict(cls, product_dict: dict) -> "ProductRecord":
+        """Creates a record from a product dictionary. Keys that are not a field of the record (e.g. date and
+        time) are ignored, missing fields are set to None."""
+        return cls(**{field: product_dict.get(field) for field in cls._fields})
+
+
+FLOAT_FIELDS = tuple(
+    field for field, field_type in ProductRecord.__annotations__.items() if field_type in (float, Optional[float])
+)
+FIELD_TYPES = {
+    field: next(arg for arg in getattr(field_type, "__args__", (field_type,)) if arg is not type(None))
+    for field, field_type in ProductRecord.__annotations__.items()
+}
+
+
+def _typed_value(field: str, value):
+    field_type = FIELD_TYPES[field]
+    if value is None or (isinstance(value, field_type) and (field_type is bool or not isinstance(value, bool))):
+        return value
+    if field_type is float and isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    if field_type is int and isinstance(value, float) and value.is_integer():
+        return int(value)
+    logging.warning("Value %r of %s is not of type %s and is dropped", value, field, field_type.__name__)
+    return None
+
+
+class ProductBatch:
+    """Columnar container for many ProductRecords. Float columns are stored in typed arrays (missing values as
+    NaN), all other columns in plain lists."""
+
+    __slots__ = ("_columns",)
+
+    def __init__(self, records: Iterable[ProductRecord] = ()):
+        self._columns = {
+            field: array("d") if field in FLOAT_FIELDS else [] for field in ProductRecord._fields
+        }
+        self.extend(records)
+
+    def __len__(self) -> int:
+        return len(self._columns["timestamp"])
+
+    def __iter__(self) -> Iterator[ProductRecord]:
+        columns = [self.column(field) for field in ProductRecord._fields]
+        for row in zip(*columns):
+            yield ProductRecord._make(row)
+
+    def append(self, record: ProductRecord) -> None:
+        """Adds a record to the end of the batch"""
+        for field, value in zip(ProductRecord._fields, record):
+            if field in FLOAT_FIELDS:
+                value = float("nan") if value is None else value
+            self._columns[field].append(value)
+
+    def extend(self, records: Iterable[ProductRecord]) -> None:
+        """Adds several records to the end of the batch"""
+        for record in records:
+            self.append(record)
+
+    def column(self, field: str) -> list:
+        """Returns the values of one column with missing values as None"""
+        values = self._columns[field]
+        if field in FLOAT_FIELDS:
+            return [None if isnan(value) else value for value in values]
+        return list(values)
+
+    def raw_column(self, field: str):
+        """Returns the stored column without conversion. Float columns are returned as array with NaN for
+        missing values."""
+        return self._columns[field]
+
+    def clear(self) -> None:
+        """Removes all records from the batch"""
+        for values in self._columns.values():
+            del values[:]
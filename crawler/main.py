@@ -3,7 +3,8 @@
     - Iterate over the defined scraping URLs in a loop
     - Call spider module to get HTML-text from the response
     - Call item_factory to extract individual tags
-    - Calling the persistence module to save item"""
+    - Calling the persistence module to save item
+    - Closing the sink of the persistence module, which writes out buffered items"""
 import json
 import sys
 import time
@@ -12,8 +13,8 @@ import logging.config
 from crawler.proxy.proxy_service import ProxyService
 from crawler.config.config_reader import read_config_files
 from crawler.header.header_creater import generate_header
-from crawler.item_factory.item_factory import create_item
-from crawler.persistence.store import store_item
+from crawler.item_factory.item_factory import create_record
+from crawler.persistence.store import create_sink
 from crawler.exceptions.proxy_exception import ProxyListIsEmptyError
 
 
@@ -37,18 +38,18 @@ def crawl(url_filepath: str, settings_filepath: str) -> None:
     settings_dict = read_config_files(url_filepath, settings_filepath)
     set_up_logging(settings_dict)
 
-    proxy_service = ProxyService()
-    for url in settings_dict["urls"]:
-        try:
-            header = generate_header(settings_dict)
-            response = proxy_service.get_html(url, header)
-            logging.info("Time for request with proxy " + response['proxy'] + ": " + str(response['time']))
-        except ProxyListIsEmptyError:
-            sys.exit(
-                "No more proxies left in the proxy list. The program has been stopped!"
-            )
-        product_dict = create_item(response["html"], url)
-        store_item(product_dict, settings_dict)
+    with ProxyService(settings_dict.get("proxy")) as proxy_service, create_sink(settings_dict) as sink:
+        for url in settings_dict["urls"]:
+            try:
+                header = generate_header(settings_dict)
+                response = proxy_service.get_html(url, header)
+                logging.info("Time for request with proxy " + response['proxy'] + ": " + str(response['time']))
+            except ProxyListIsEmptyError:
+                sys.exit(
+                    "No more proxies left in the proxy list. The program has been stopped!"
+                )
+            record = create_record(response["html"], url, response["encoding"])
+            sink.write(record)
 
     logging.info("Total run time: " + str(time.time() - start_time))
 
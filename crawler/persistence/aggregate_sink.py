@@ -0,0 +1,115 @@
+"""Running price aggregates per (asin, client), updated by AggregateSink for every stored record and kept in a binary
+state file."""
+
+import os
+import struct
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from crawler.item_factory.product_record import ProductRecord
+from crawler.persistence.sink import Sink, WrappingSink
+
+_KEY_LENGTH = struct.Struct("<H")
+_VALUES = struct.Struct("<Qddddddd")
+
+
+class PriceAggregate(NamedTuple):
+    """Running aggregates of the current price of one asin on one client."""
+    count: int
+    minimum: float
+    maximum: float
+    mean: float
+    last_price: float
+    last_timestamp: float
+    last_change: float
+    ewma: float
+
+
+def update_aggregate(aggregate: Optional[PriceAggregate], price: float, timestamp: float,
+                     alpha: float) -> PriceAggregate:
+    """Returns the aggregate updated with one observation. Observations older than the last one are counted in
+    min, max and mean but do not change the last price, the last change and the ewma"""
+    if aggregate is None:
+        return PriceAggregate(1, price, price, price, price, timestamp, timestamp, price)
+    count = aggregate.count + 1
+    updated = aggregate._replace(
+        count=count,
+        minimum=min(aggregate.minimum, price),
+        maximum=max(aggregate.maximum, price),
+        mean=aggregate.mean + (price - aggregate.mean) / count,
+    )
+    if timestamp < aggregate.last_timestamp:
+        return updated
+    return updated._replace(
+        last_price=price,
+        last_timestamp=timestamp,
+        last_change=timestamp if price != aggregate.last_price else aggregate.last_change,
+        ewma=alpha * price + (1 - alpha) * aggregate.ewma,
+    )
+
+
+class AggregateSink(WrappingSink):
+    """Passes the records on to the wrapped sink and updates the price aggregates of their (asin, client)."""
+
+    def __init__(self, sink: Sink, client: str, state_path: str = None, alpha: float = 0.3):
+        super().__init__(sink)
+        self.client = client
+        self.state_path = state_path
+        self.alpha = alpha
+        self.aggregates = read_aggregates(state_path) if state_path is not None else {}
+
+    @classmethod
+    def from_settings(cls, sink: Sink, settings_dict: dict) -> "AggregateSink":
+        """Wraps the sink with the state file and ewma weight given in the settings"""
+        storage = settings_dict.get("storage") or {}
+        return cls(
+            sink,
+            settings_dict["client"],
+            storage.get("aggregates_state_file", "../output/" + settings_dict["client"] + "_aggregates.bin"),
+            alpha=storage.get("aggregates_alpha", 0.3),
+        )
+
+    def get(self, asin: str, client: str = None) -> Optional[PriceAggregate]:
+        """Returns the current aggregate of the asin"""
+        return self.aggregates.get((asin, client if client is not None else self.client))
+
+    def write(self, record: ProductRecord) -> None:
+        super().write(record)
+        if record.asin is None or record.current_price is None:
+            return
+        key = (record.asin, self.client)
+        self.aggregates[key] = update_aggregate(self.aggregates.get(key), record.current_price, record.timestamp,
+                                                self.alpha)
+
+    def close(self) -> None:
+        super().close()
+        if self.state_path is not None:
+            write_aggregates(self.state_path, self.aggregates)
+
+
+def read_aggregates(path: str) -> Dict[Tuple[str, str], PriceAggregate]:
+    """Reads the aggregates of a state file by (asin, client)"""
+    aggregates = {}
+    if not os.path.exists(path):
+        return aggregates
+    with open(path, "rb") as file:
+        data = file.read()
+    offset = 0
+    while offset < len(data):
+        (length,) = _KEY_LENGTH.unpack_from(data, offset)
+        offset += _KEY_LENGTH.size
+        asin, _, client = data[offset:offset + length].decode("utf-8").partition("|")
+        offset += length
+        aggregates[(asin, client)] = PriceAggregate(*_VALUES.unpack_from(data, offset))
+        offset += _VALUES.size
+    return aggregates
+
+
+def write_aggregates(path: str, aggregates: Dict[Tuple[str, str], PriceAggregate]) -> None:
+    """Replaces the state file with the aggregates, one entry per (asin, client): the length of the key, the key
+    and the eight numbers of the aggregate"""
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        for (asin, client), aggregate in aggregates.items():
+            key = (asin + "|" + client).encode("utf-8")
+            file.write(_KEY_LENGTH.pack(len(key)) + key + _VALUES.pack(*aggregate))
+    os.replace(temporary, path)
@@ -0,0 +1,102 @@
+"""Asynchronous storage: AsyncSink queues the records and writes them to the wrapped sink in batches from a background
+thread."""
+
+import logging
+import queue
+import threading
+import time
+
+from crawler.item_factory.product_record import ProductRecord
+from crawler.persistence.sink import Sink
+
+_STOP = object()
+
+
+class AsyncSink(Sink):
+    """Writes the records to the wrapped sink in a background thread."""
+
+    def __init__(self, sink: Sink, queue_size: int = 1000, batch_size: int = 100):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.written = 0
+        self.batches = 0
+        self.total_write_time = 0.0
+        self.max_write_time = 0.0
+        self.max_queue_depth = 0
+        self._error = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="store-worker", daemon=True)
+        self._thread.start()
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of records waiting to be written"""
+        return self.queue.qsize()
+
+    def stats(self) -> dict:
+        """Returns queue depth and write latency of the worker"""
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "written": self.written,
+            "batches": self.batches,
+            "average_write_time": self.total_write_time / self.batches if self.batches else 0.0,
+            "max_write_time": self.max_write_time,
+        }
+
+    def write(self, record: ProductRecord) -> None:
+        self._raise_error()
+        self.queue.put(record)
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+
+    def flush(self) -> None:
+        """Waits until all queued records are written and flushes the wrapped sink"""
+        self.queue.join()
+        self._raise_error()
+        self.sink.flush()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self.queue.put(_STOP)
+        self._thread.join()
+        logging.info("Store worker stopped: " + str(self.stats()))
+        self.sink.close()
+        self._raise_error()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self.queue.get()]
+            while batch[-1] is not _STOP and len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is _STOP
+            records = batch[:-1] if stop else batch
+            if records and self._error is None:
+                self._write_batch(records)
+            for _ in batch:
+                self.queue.task_done()
+            if stop:
+                return
+
+    def _write_batch(self, records: list) -> None:
+        start = time.monotonic()
+        try:
+            self.sink.write_batch(records)
+        except Exception as error:  # the error is raised again in the crawl thread
+            logging.error("Store worker could not write %s records: %s", len(records), error)
+            self._error = error
+            return
+        duration = time.monotonic() - start
+        self.written += len(records)
+        self.batches += 1
+        self.total_write_time += duration
+        self.max_write_time = max(self.max_write_time, duration)
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,259 @@
+"""Compaction of the partitioned output: merges the finished runs of a client and date into a few sorted parquet files
+and publishes them in the date manifest, locally or in S3 (python -m crawler.persistence.compaction --help).
+Requires the optional pyarrow package."""
+
+import argparse
+import io
+import json
+import logging
+import os
+from datetime import date as date_type
+from typing import Iterator, List, Optional
+
+import boto3
+
+from crawler.exceptions.store_exception import CompactionError
+from crawler.item_factory.product_record import ProductRecord
+from crawler.persistence.csv_format import read_csv_records
+from crawler.persistence.parquet_format import ParquetPartitionWriter, read_parquet_records
+from crawler.persistence.partitioning import MANIFEST_NAME, Partition, build_manifest, parse_partition
+from crawler.persistence.sink import new_run_id
+
+
+class LocalObjectStore:
+    """Keys are paths relative to a local directory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def list(self, prefix: str) -> List[str]:
+        """Returns all keys below the prefix"""
+        root = os.path.join(self.directory, prefix)
+        keys = []
+        for path, _, files in os.walk(root):
+            for file in files:
+                keys.append(os.path.relpath(os.path.join(path, file), self.directory).replace(os.sep, "/"))
+        return sorted(keys)
+
+    def read(self, key: str) -> Optional[bytes]:
+        """Returns the content of the key or None if it does not exist"""
+        path = os.path.join(self.directory, key)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as file:
+            return file.read()
+
+    def write(self, key: str, data: bytes) -> None:
+        """Writes the key atomically"""
+        path = os.path.join(self.directory, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as file:
+            file.write(data)
+        os.replace(path + ".tmp", path)
+
+    def delete(self, keys: List[str]) -> None:
+        """Deletes the keys"""
+        for key in keys:
+            os.remove(os.path.join(self.directory, key))
+
+
+class S3ObjectStore:
+    """Keys are the keys of an S3 bucket."""
+
+    def __init__(self, bucket: str, s3_client=None):
+        self.bucket = bucket
+        self.s3_client = s3_client if s3_client is not None else boto3.client("s3")
+
+    def list(self, prefix: str) -> List[str]:
+        """Returns all keys below the prefix"""
+        keys = []
+        for page in self.s3_client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=prefix):
+            keys += [obj["Key"] for obj in page.get("Contents", [])]
+        return sorted(keys)
+
+    def read(self, key: str) -> Optional[bytes]:
+        """Returns the content of the key or None if it does not exist"""
+        try:
+            return self.s3_client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+
+    def write(self, key: str, data: bytes) -> None:
+        """Writes the key, an S3 put replaces an object atomically"""
+        self.s3_client.put_object(Bucket=self.bucket, Key=key, Body=data)
+
+    def delete(self, keys: List[str]) -> None:
+        """Deletes the keys, 1000 keys per request"""
+        for start in range(0, len(keys), 1000):
+            self.s3_client.delete_objects(
+                Bucket=self.bucket, Delete={"Objects": [{"Key": key} for key in keys[start:start + 1000]]}
+            )
+
+
+def client_prefix(prefix: str, client: str) -> str:
+    """Returns the key prefix of all partitions of a client, ending with a slash"""
+    parts = [prefix.strip("/")] if prefix and prefix.strip("/") else []
+    return "/".join(parts + ["client=" + client]) + "/"
+
+
+def date_prefix(prefix: str, client: str, date: str) -> str:
+    """Returns the key prefix of all runs of a client on a date, ending with a slash"""
+    return client_prefix(prefix, client) + "date=" + date + "/"
+
+
+def _read_manifest(store, key: str) -> Optional[dict]:
+    data = store.read(key)
+    return json.loads(data) if data is not None else None
+
+
+def _run_manifests(store, prefix: str, client: str, date: str) -> dict:
+    """Returns the manifests of the finished runs of the date by run id. Runs without manifest are still
+    being written or have failed and are ignored."""
+    manifests = {}
+    base = date_prefix(prefix, client, date)
+    for key in store.list(base):
+        if key.endswith("/" + MANIFEST_NAME) and key != base + MANIFEST_NAME:
+            run_id = parse_partition(key).get("run")
+            if run_id is not None:
+                manifests[run_id] = _read_manifest(store, key)
+    return manifests
+
+
+def list_data_files(store, prefix: str, client: str, date: str) -> List[str]:
+    """Returns the data files of a client and date: the compacted files and the files of the runs that were
+    written after the last compaction"""
+    current = _read_manifest(store, date_prefix(prefix, client, date) + MANIFEST_NAME)
+    compacted_runs = set(current["compacted_runs"]) if current else set()
+    keys = [file["key"] for file in current["files"]] if current else []
+    for run_id, manifest in sorted(_run_manifests(store, prefix, client, date).items()):
+        if run_id not in compacted_runs:
+            keys += [file["key"] for file in manifest["files"]]
+    return keys
+
+
+def read_records(store, key: str) -> Iterator[ProductRecord]:
+    """Reads the records of a csv or parquet data file"""
+    data = store.read(key)
+    if key.endswith(".parquet"):
+        return read_parquet_records(io.BytesIO(data))
+    return read_csv_records(io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", newline=""))
+
+
+def compact_partition(store, prefix: str, client: str, date: str, target_bytes: int = 128 * 1024 * 1024,
+                      row_group_rows: int = 10000, delete_sources: bool = False) -> Optional[dict]:
+    """Merges the runs of a client and date into sorted parquet files and publishes them with the date manifest.
+    Returns the new manifest or None if there was nothing to compact."""
+    base = date_prefix(prefix, client, date)
+    current = _read_manifest(store, base + MANIFEST_NAME)
+    compacted_runs = list(current["compacted_runs"]) if current else []
+    sources = list(current["files"]) if current else []
+    new_runs = {
+        run_id: manifest for run_id, manifest in _run_manifests(store, prefix, client, date).items()
+        if run_id not in compacted_runs
+    }
+    if not new_runs:
+        logging.info("Nothing to compact for client %s on %s", client, date)
+        return None
+    for run_id in sorted(new_runs):
+        sources += new_runs[run_id]["files"]
+        compacted_runs.append(run_id)
+
+    records = []
+    for source in sources:
+        rows = list(read_records(store, source["key"]))
+        if len(rows) != source["rows"]:
+            raise CompactionError("File %s contains %s rows, the manifest expects %s"
+                                  % (source["key"], len(rows), source["rows"]))
+        records += rows
+    records.sort(key=lambda record: (record.asin or "", record.timestamp))
+
+    generation = new_run_id()
+    files = _write_files(store, base + "compacted/" + generation + "/", records, target_bytes, row_group_rows)
+    written = sum(file["rows"] for file in files)
+    if written != len(records):
+        raise CompactionError("Compaction wrote %s rows but read %s rows" % (written, len(records)))
+
+    manifest = build_manifest({"client": client, "date": date}, files, generation=generation,
+                              compacted_runs=compacted_runs)
+    store.write(base + MANIFEST_NAME, manifest)
+    logging.info("Compacted %s runs with %s rows into %s files", len(new_runs), written, len(files))
+
+    if delete_sources:
+        _delete_obsolete(store, base, set(compacted_runs), generation)
+    return json.loads(manifest)
+
+
+def _delete_obsolete(store, base: str, compacted_runs: set, generation: str) -> None:
+    """Deletes the files of the compacted runs and of the older compactions. Runs that are not listed in the
+    manifest are kept, they may have been written during the compaction."""
+    obsolete = []
+    for key in store.list(base):
+        values = parse_partition(key)
+        if values.get("run") in compacted_runs:
+            obsolete.append(key)
+        elif key.startswith(base + "compacted/") and not key.startswith(base + "compacted/" + generation + "/"):
+            obsolete.append(key)
+    store.delete(obsolete)
+
+
+def _write_files(store, key_prefix: str, records: List[ProductRecord], target_bytes: int,
+                 row_group_rows: int) -> List[dict]:
+    files = []
+    partition = None
+    for record in records:
+        if partition is None:
+            buffer = io.BytesIO()
+            partition = Partition(key_prefix, {}, buffer, ParquetPartitionWriter(buffer, row_group_rows))
+        partition.write(record)
+        if partition.file.tell() >= target_bytes:
+            files.append(_store_file(store, partition, key_prefix + "part-%05d.parquet" % len(files)))
+            partition = None
+    if partition is not None:
+        files.append(_store_file(store, partition, key_prefix + "part-%05d.parquet" % len(files)))
+    return files
+
+
+def _store_file(store, partition: Partition, key: str) -> dict:
+    partition.writer.finish()
+    data = partition.file.getvalue()
+    store.write(key, data)
+    return partition.file_info(key, len(data))
+
+
+def _dates_to_compact(store, prefix: str, client: str) -> List[str]:
+    """Returns all dates of the client before today"""
+    today = date_type.today().isoformat()
+    dates = {parse_partition(key).get("date") for key in store.list(client_prefix(prefix, client))}
+    return sorted(date for date in dates if date is not None and date < today)
+
+
+def main(arguments: List[str] = None) -> None:
+    """Command line interface of the compaction job"""
+    parser = argparse.ArgumentParser(description="Merges the small run files of a partition into large files.")
+    parser.add_argument("--directory", help="local output directory")
+    parser.add_argument("--bucket", help="S3 bucket")
+    parser.add_argument("--endpoint-url", help="endpoint of a local S3 stand-in")
+    parser.add_argument("--prefix", default="products")
+    parser.add_argument("--client", required=True)
+    parser.add_argument("--date", help="date to compact, default: all dates before today")
+    parser.add_argument("--target-bytes", type=int, default=128 * 1024 * 1024)
+    parser.add_argument("--row-group-rows", type=int, default=10000)
+    parser.add_argument("--delete-sources", action="store_true", help="delete the compacted run files")
+    args = parser.parse_args(arguments)
+
+    if args.bucket:
+        store = S3ObjectStore(args.bucket, boto3.client("s3", endpoint_url=args.endpoint_url))
+    elif args.directory:
+        store = LocalObjectStore(args.directory)
+    else:
+        parser.error("either --directory or --bucket is required")
+
+    dates = [args.date] if args.date else _dates_to_compact(store, args.prefix, args.client)
+    for date in dates:
+        compact_partition(store, args.prefix, args.client, date, args.target_bytes, args.row_group_rows,
+                          args.delete_sources)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,161 @@
+"""Column layout of the csv output and the writers of csv files."""
+
+import csv
+import io
+import os
+import threading
+import time
+from os.path import exists
+from typing import Iterator
+
+from crawler.item_factory.product_record import FLOAT_FIELDS, ProductRecord
+from crawler.persistence.sink import Sink
+
+CSV_HEADER = (
+    "timestamp",
+    "date",
+    "time",
+    "name",
+    "current_price",
+    "price_regular",
+    "prime",
+    "discount_in_euros",
+    "percent_discount",
+    "sold_by_amazon",
+    "seller",
+    "amazon_choice",
+    "asin",
+    "url",
+)
+
+
+def csv_values(record: ProductRecord) -> list:
+    """Returns the values of the record in the order of CSV_HEADER. Commas and quotes are removed from strings."""
+    write_values = []
+    for header in CSV_HEADER:
+        value = getattr(record, header)
+        if isinstance(value, str):
+            value = value.replace(",", "")
+            value = value.replace('"', '').replace("'", '')
+        write_values.append(value)
+    return write_values
+
+
+def read_csv_records(file) -> Iterator[ProductRecord]:
+    """Reads the records of a csv file with CSV_HEADER columns (text mode). Only the columns of the csv layout
+    are set, date and time are derived from the timestamp again."""
+    for row in csv.DictReader(file):
+        values = {}
+        for header in CSV_HEADER:
+            if header in ("date", "time"):
+                continue
+            value = row.get(header)
+            if value in ("", "None", None):
+                value = None
+            elif header in FLOAT_FIELDS:
+                value = float(value)
+            elif header in ("prime", "sold_by_amazon", "amazon_choice"):
+                value = value == "True"
+            values[header] = value
+        yield ProductRecord(**values)
+
+
+class CsvPartitionWriter:
+    """Writes records as csv lines into a binary file, starting with the header."""
+
+    extension = ".csv"
+
+    def __init__(self, file):
+        self.file = file
+        self._line = io.StringIO()
+        self._writer = csv.writer(self._line)
+        self._write_line(CSV_HEADER)
+
+    def write(self, record: ProductRecord) -> None:
+        """Appends the record as csv line"""
+        self._write_line(csv_values(record))
+
+    def finish(self) -> None:
+        """Nothing to finish, every line is written immediately"""
+
+    def _write_line(self, values) -> None:
+        self._writer.writerow(values)
+        self.file.write(self._line.getvalue().encode("utf-8"))
+        self._line.seek(0)
+        self._line.truncate()
+
+
+class CsvFileSink(Sink):
+    """Long-lived writer of a local csv file. The file is opened once, the header is only written to a new
+    file and rows are buffered in memory. The buffer is written to the file when it holds flush_rows rows or
+    flush_bytes characters, or when a row is written flush_interval seconds after the last flush, and always on
+    flush() and close()."""
+
+    def __init__(self, filepath: str, flush_rows: int = 100, flush_bytes: int = 1024 * 1024,
+                 flush_interval: float = 30.0):
+        self.filepath = filepath
+        self.flush_rows = flush_rows
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self._file = None
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._buffered_rows = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings_dict: dict) -> "CsvFileSink":
+        """Creates the sink for the client and flush policy given in the settings"""
+        storage = settings_dict.get("storage") or {}
+        return cls(
+            "../output/" + settings_dict["client"] + ".csv",
+            flush_rows=storage.get("csv_flush_rows", 100),
+            flush_bytes=storage.get("csv_flush_bytes", 1024 * 1024),
+            flush_interval=storage.get("csv_flush_interval", 30.0),
+        )
+
+    @property
+    def size(self) -> int:
+        """Size of the file in bytes plus the number of buffered characters"""
+        with self._lock:
+            if self._file is not None:
+                size = self._file.tell()
+            else:
+                size = os.path.getsize(self.filepath) if exists(self.filepath) else 0
+            return size + self._buffer.tell()
+
+    def write(self, record: ProductRecord) -> None:
+        with self._lock:
+            self._writer.writerow(csv_values(record))
+            self._buffered_rows += 1
+            if (self._buffered_rows >= self.flush_rows
+                    or self._buffer.tell() >= self.flush_bytes
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _flush(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._buffered_rows:
+            return
+        if self._file is None:
+            file_exists = exists(self.filepath) and os.path.getsize(self.filepath) > 0
+            self._file = open(self.filepath, 'a', encoding='utf-8', newline='')
+            if not file_exists:
+                csv.writer(self._file).writerow(CSV_HEADER)
+        self._file.write(self._buffer.getvalue())
+        self._file.flush()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._buffered_rows = 0
@@ -0,0 +1,122 @@
+"""Idempotent writes: DedupSink drops records whose (asin, client, time bucket) has already been written. The seen keys
+can be kept in a binary file across runs."""
+
+import hashlib
+import os
+import struct
+import time
+
+from crawler.item_factory.product_record import ProductRecord
+from crawler.persistence.sink import Sink, WrappingSink
+
+_ENTRY = struct.Struct("<qQ")
+
+
+def record_key(asin: str, client: str, bucket: int) -> int:
+    """Returns the 64 bit hash of the key of a record"""
+    digest = hashlib.blake2b(("%s|%s|%d" % (asin, client, bucket)).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class KeySet:
+    """In-memory set of the seen keys."""
+
+    def __init__(self):
+        self.keys = set()
+
+    def add(self, bucket: int, key: int) -> bool:
+        """Adds the key and returns False if it was already contained"""
+        if key in self.keys:
+            return False
+        self.keys.add(key)
+        return True
+
+    def commit(self) -> None:
+        """Persists the keys added since the last commit"""
+
+    def close(self) -> None:
+        """Releases the resources of the key set"""
+
+
+class FileKeySet(KeySet):
+    """Set of the seen keys, persisted in a binary file."""
+
+    def __init__(self, path: str, retention_buckets: int = None, current_bucket: int = None):
+        super().__init__()
+        self.path = path
+        entries = []
+        if os.path.exists(path):
+            with open(path, "rb") as file:
+                data = file.read()
+            usable = len(data) - len(data) % _ENTRY.size
+            oldest = None
+            if retention_buckets is not None and current_bucket is not None:
+                oldest = current_bucket - retention_buckets
+            entries = [entry for entry in _ENTRY.iter_unpack(data[:usable]) if oldest is None or entry[0] >= oldest]
+            if len(entries) * _ENTRY.size != len(data):
+                _rewrite(path, entries)
+        self.keys = {key for _, key in entries}
+        self._pending = []
+
+    def add(self, bucket: int, key: int) -> bool:
+        if not super().add(bucket, key):
+            return False
+        self._pending.append((bucket, key))
+        return True
+
+    def commit(self) -> None:
+        with open(self.path, "ab") as file:
+            for entry in self._pending:
+                file.write(_ENTRY.pack(*entry))
+        self._pending = []
+
+
+def _rewrite(path: str, entries: list) -> None:
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        for entry in entries:
+            file.write(_ENTRY.pack(*entry))
+    os.replace(temporary, path)
+
+
+class DedupSink(WrappingSink):
+    """Drops records whose (asin, client, time bucket) has already been written."""
+
+    def __init__(self, sink: Sink, client: str, bucket_seconds: int = 3600, key_set: KeySet = None):
+        super().__init__(sink)
+        self.client = client
+        self.bucket_seconds = bucket_seconds
+        self.key_set = key_set if key_set is not None else KeySet()
+        self.dropped = 0
+
+    @classmethod
+    def from_settings(cls, sink: Sink, settings_dict: dict) -> "DedupSink":
+        """Wraps the sink with the bucket size and key file given in the settings"""
+        storage = settings_dict.get("storage") or {}
+        bucket_seconds = storage.get("dedup_bucket_seconds", 3600)
+        key_file = storage.get("dedup_key_file")
+        key_set = None
+        if key_file:
+            key_set = FileKeySet(key_file, retention_buckets=storage.get("dedup_retention_buckets", 24 * 7),
+                                 current_bucket=int(time.time() // bucket_seconds))
+        return cls(sink, settings_dict["client"], bucket_seconds, key_set)
+
+    def write(self, record: ProductRecord) -> None:
+        if record.asin is not None:
+            bucket = int(record.timestamp // self.bucket_seconds)
+            if not self.key_set.add(bucket, record_key(record.asin, self.client, bucket)):
+                self.dropped += 1
+                return
+        super().write(record)
+
+    def flush(self) -> None:
+        """Flushes the wrapped sink and then persists the keys of the records it has stored"""
+        super().flush()
+        self.key_set.commit()
+
+    def close(self) -> None:
+        try:
+            super().close()
+            self.key_set.commit()
+        finally:
+            self.key_set.close()
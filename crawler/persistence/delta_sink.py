@@ -0,0 +1,110 @@
+"""Change data capture: DeltaSink only stores a record if a tracked field changed or its heartbeat is due,
+rebuild_series turns the stored deltas back into a full time series."""
+
+import json
+import os
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional
+
+from crawler.item_factory.product_record import ProductRecord
+from crawler.persistence.sink import Sink, WrappingSink
+
+TRACKED_FIELDS = (
+    "current_price",
+    "price_regular",
+    "prime",
+    "discount_in_euros",
+    "percent_discount",
+    "sold_by_amazon",
+    "seller",
+    "shipping",
+    "amazon_choice",
+    "number_of_reviews",
+    "review_score",
+)
+
+
+class DeltaSink(WrappingSink):
+    """Writes a record only if a tracked field changed or the heartbeat of the asin is due."""
+
+    def __init__(self, sink: Sink, client: str, state_path: str = None,
+                 tracked_fields: Iterable[str] = TRACKED_FIELDS, heartbeat_seconds: float = 24 * 3600):
+        super().__init__(sink)
+        self.client = client
+        self.state_path = state_path
+        self.tracked_fields = tuple(tracked_fields)
+        self.heartbeat_seconds = heartbeat_seconds
+        self.state = _read_state(state_path)
+        self.skipped = 0
+
+    @classmethod
+    def from_settings(cls, sink: Sink, settings_dict: dict) -> "DeltaSink":
+        """Wraps the sink with the state file, tracked fields and heartbeat given in the settings"""
+        storage = settings_dict.get("storage") or {}
+        return cls(
+            sink,
+            settings_dict["client"],
+            storage.get("delta_state_file", "../output/" + settings_dict["client"] + "_delta_state.json"),
+            tracked_fields=storage.get("delta_tracked_fields", TRACKED_FIELDS),
+            heartbeat_seconds=storage.get("delta_heartbeat_seconds", 24 * 3600),
+        )
+
+    def write(self, record: ProductRecord) -> None:
+        if record.asin is None:
+            super().write(record)
+            return
+        key = record.asin + "|" + self.client
+        values = [getattr(record, field) for field in self.tracked_fields]
+        last = self.state.get(key)
+        if (last is not None and last["values"] == values
+                and record.timestamp - last["written"] < self.heartbeat_seconds):
+            self.skipped += 1
+            return
+        super().write(record)
+        self.state[key] = {"values": values, "written": record.timestamp}
+
+    def close(self) -> None:
+        super().close()
+        _write_state(self.state_path, self.state)
+
+
+def rebuild_series(deltas: Iterable[ProductRecord], timestamps: Iterable[float],
+                   heartbeat_seconds: float = None) -> Dict[str, List[Optional[ProductRecord]]]:
+    """Rebuilds the full time series from the stored deltas. For every asin and every given timestamp (e.g. the
+    times of the runs) the last delta before the timestamp is returned with that timestamp. If heartbeat_seconds
+    is given, a delta older than the heartbeat is not used, because a heartbeat row would have been written if the
+    product had still been observed. In that case and before the first delta the entry is None."""
+    timestamps = sorted(timestamps)
+    by_asin = {}
+    for record in sorted(deltas, key=lambda delta: delta.timestamp):
+        by_asin.setdefault(record.asin, []).append(record)
+
+    series = {}
+    for asin, records in by_asin.items():
+        record_times = [record.timestamp for record in records]
+        values = []
+        for timestamp in timestamps:
+            position = bisect_right(record_times, timestamp) - 1
+            if position < 0 or (heartbeat_seconds is not None
+                                and timestamp - record_times[position] > heartbeat_seconds):
+                values.append(None)
+            else:
+                values.append(records[position]._replace(timestamp=timestamp))
+        series[asin] = values
+    return series
+
+
+def _read_state(path: str) -> dict:
+    if path is None or not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _write_state(path: str, state: dict) -> None:
+    if path is None:
+        return
+    temporary = path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(state, file)
+    os.replace(temporary, path)
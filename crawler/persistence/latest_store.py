@@ -0,0 +1,185 @@
+"""Latest snapshot of every product: LatestSnapshotSink keeps the newest record per (asin, client) in a local dbm
+file or a DynamoDB table."""
+
+import dbm
+import json
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import boto3
+from botocore.exceptions import ClientError
+
+from crawler.item_factory.product_record import ProductRecord
+from crawler.persistence.sink import Sink, WrappingSink
+
+Key = Tuple[str, str]
+
+
+class FileSnapshotStore:
+    """Snapshot in a local dbm file. The values are the records as json."""
+
+    def __init__(self, path: str):
+        self.db = dbm.open(path, "c")
+
+    def put_many(self, items: Dict[Key, ProductRecord]) -> None:
+        """Stores the records unless the stored record of the key is newer"""
+        for (asin, client), record in items.items():
+            key = asin + "|" + client
+            stored = self.db.get(key)
+            if stored is not None and json.loads(stored)["timestamp"] > record.timestamp:
+                continue
+            self.db[key] = json.dumps(record._asdict())
+
+    def get(self, asin: str, client: str) -> Optional[ProductRecord]:
+        """Returns the latest record of the asin on the client"""
+        stored = self.db.get(asin + "|" + client)
+        return ProductRecord(**json.loads(stored)) if stored is not None else None
+
+    def get_many(self, keys: Iterable[Key]) -> Dict[Key, ProductRecord]:
+        """Returns the latest records of several (asin, client) keys. Unknown keys are left out"""
+        records = {}
+        for asin, client in keys:
+            record = self.get(asin, client)
+            if record is not None:
+                records[(asin, client)] = record
+        return records
+
+    def close(self) -> None:
+        """Closes the dbm file"""
+        self.db.close()
+
+
+class DynamoSnapshotStore:
+    """Snapshot in a DynamoDB table with the partition key asin and the sort key client."""
+
+    def __init__(self, table_name: str, endpoint_url: str = None, dynamodb=None):
+        dynamodb = dynamodb if dynamodb is not None else boto3.resource("dynamodb", endpoint_url=endpoint_url)
+        self.table = dynamodb.Table(table_name)
+        self.dynamodb = dynamodb
+
+    def put_many(self, items: Dict[Key, ProductRecord]) -> None:
+        """Stores the records unless the stored record of the key is newer. Batch writes cannot be conditional,
+        so every record is a conditional put"""
+        for (_, client), record in items.items():
+            try:
+                self.table.put_item(
+                    Item=_to_item(record, client),
+                    ConditionExpression="attribute_not_exists(asin) OR #ts <= :ts",
+                    ExpressionAttributeNames={"#ts": "timestamp"},
+                    ExpressionAttributeValues={":ts": Decimal(str(record.timestamp))},
+                )
+            except ClientError as error:
+                if error.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+
+    def get(self, asin: str, client: str) -> Optional[ProductRecord]:
+        """Returns the latest record of the asin on the client"""
+        item = self.table.get_item(Key={"asin": asin, "client": client}).get("Item")
+        return _from_item(item) if item is not None else None
+
+    def get_many(self, keys: Iterable[Key]) -> Dict[Key, ProductRecord]:
+        """Returns the latest records of several (asin, client) keys with batch reads of up to 100 keys.
+        Unknown keys are left out"""
+        keys = list(dict.fromkeys(keys))
+        records = {}
+        for start in range(0, len(keys), 100):
+            request = {self.table.name: {"Keys": [{"asin": asin, "client": client}
+                                                  for asin, client in keys[start:start + 100]]}}
+            while request:
+                response = self.dynamodb.batch_get_item(RequestItems=request)
+                for item in response["Responses"].get(self.table.name, []):
+                    records[(item["asin"], item["client"])] = _from_item(item)
+                request = response.get("UnprocessedKeys")
+        return records
+
+    def close(self) -> None:
+        """Nothing to close, the boto3 resource has no open handles"""
+
+
+def create_snapshot_table(table_name: str, endpoint_url: str = None, dynamodb=None):
+    """Creates the DynamoDB table of the snapshot, e.g. in a local stand-in"""
+    dynamodb = dynamodb if dynamodb is not None else boto3.resource("dynamodb", endpoint_url=endpoint_url)
+    table = dynamodb.create_table(
+        TableName=table_name,
+        KeySchema=[{"AttributeName": "asin", "KeyType": "HASH"}, {"AttributeName": "client", "KeyType": "RANGE"}],
+        AttributeDefinitions=[{"AttributeName": "asin", "AttributeType": "S"},
+                              {"AttributeName": "client", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    table.wait_until_exists()
+    return table
+
+
+def _to_item(record: ProductRecord, client: str) -> dict:
+    item = {"client": client}
+    for field, value in record._asdict().items():
+        if value is None:
+            continue
+        item[field] = Decimal(str(value)) if isinstance(value, float) else value
+    return item
+
+
+def _from_item(item: dict) -> ProductRecord:
+    values = {}
+    for field in ProductRecord._fields:
+        value = item.get(field)
+        if isinstance(value, Decimal):
+            value = int(value) if field == "number_of_reviews" else float(value)
+        values[field] = value
+    return ProductRecord(**values)
+
+
+class LatestSnapshotSink(WrappingSink):
+    """Passes the records on to the history sink and updates the snapshot store every batch_size products."""
+
+    def __init__(self, sink: Sink, store, client: str, batch_size: int = 100):
+        super().__init__(sink)
+        self.store = store
+        self.client = client
+        self.batch_size = batch_size
+        self._pending = {}
+
+    @classmethod
+    def from_settings(cls, sink: Sink, settings_dict: dict) -> "LatestSnapshotSink":
+        """Wraps the sink with the snapshot store given in the settings"""
+        storage = settings_dict.get("storage") or {}
+        if storage["latest"] == "dynamodb":
+            store = DynamoSnapshotStore(storage.get("latest_table", "latest_products"),
+                                        endpoint_url=storage.get("dynamodb_endpoint_url"))
+        else:
+            store = FileSnapshotStore(storage.get("latest_path", "../output/latest"))
+        return cls(sink, store, settings_dict["client"], storage.get("latest_batch_size", 100))
+
+    def write(self, record: ProductRecord) -> None:
+        super().write(record)
+        if record.asin is None:
+            return
+        key = (record.asin, self.client)
+        pending = self._pending.get(key)
+        if pending is None or pending.timestamp <= record.timestamp:
+            self._pending[key] = record
+        if len(self._pending) >= self.batch_size:
+            self._write_pending()
+
+    def flush(self) -> None:
+        super().flush()
+        self._write_pending()
+
+    def close(self) -> None:
+        try:
+            super().close()
+            self._write_pending()
+        finally:
+            self.store.close()
+
+    def _write_pending(self) -> None:
+        if self._pending:
+            self.store.put_many(self._pending)
+            self._pending = {}
+
+
+def latest_prices(store, asins: List[str], clients: List[str]) -> Dict[Key, Optional[float]]:
+    """Returns the current price of every combination of asin and client with one batch read, e.g. for a
+    dashboard"""
+    records = store.get_many((asin, client) for asin in asins for client in clients)
+    return {key: record.current_price for key, record in records.items()}
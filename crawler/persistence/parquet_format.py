@@ -0,0 +1,106 @@
+"""Parquet output format with typed, dictionary encoded columns, written in row groups. Requires the optional pyarrow
+package."""
+
+from typing import Iterator
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from crawler.item_factory.product_record import ProductBatch, ProductRecord
+
+SCHEMA = pa.schema([
+    ("timestamp", pa.timestamp("us", tz="UTC")),
+    ("name", pa.string()),
+    ("current_price", pa.float64()),
+    ("price_regular", pa.float64()),
+    ("prime", pa.bool_()),
+    ("discount_in_euros", pa.float64()),
+    ("percent_discount", pa.float64()),
+    ("sold_by_amazon", pa.bool_()),
+    ("seller", pa.string()),
+    ("brand", pa.string()),
+    ("shipping", pa.float64()),
+    ("amazon_choice", pa.bool_()),
+    ("amazon_choice_for", pa.string()),
+    ("asin", pa.string()),
+    ("product_id", pa.string()),
+    ("manufacturer", pa.string()),
+    ("country_of_origin", pa.string()),
+    ("product_dimensions", pa.string()),
+    ("number_of_reviews", pa.int64()),
+    ("review_score", pa.float64()),
+    ("on_sale_since", pa.string()),
+    ("url", pa.string()),
+])
+
+DICTIONARY_COLUMNS = [
+    "name",
+    "seller",
+    "brand",
+    "amazon_choice_for",
+    "asin",
+    "product_id",
+    "manufacturer",
+    "country_of_origin",
+    "product_dimensions",
+    "on_sale_since",
+    "url",
+]
+
+
+def batch_to_table(batch: ProductBatch) -> pa.Table:
+    """Converts a ProductBatch into an arrow table with the parquet SCHEMA"""
+    columns = []
+    for field in SCHEMA:
+        if field.name == "timestamp":
+            micros = pa.array([round(value * 1_000_000) for value in batch.raw_column("timestamp")], pa.int64())
+            columns.append(micros.cast(field.type))
+        else:
+            columns.append(pa.array(batch.column(field.name), field.type))
+    return pa.Table.from_arrays(columns, schema=SCHEMA)
+
+
+def table_to_records(table: pa.Table) -> Iterator[ProductRecord]:
+    """Converts an arrow table with the parquet SCHEMA back into ProductRecords"""
+    timestamps = table.column("timestamp").cast(pa.int64()).to_pylist()
+    columns = [table.column(field).to_pylist() for field in ProductRecord._fields[1:]]
+    for timestamp, *values in zip(timestamps, *columns):
+        yield ProductRecord(timestamp / 1_000_000, *values)
+
+
+def read_parquet_records(source) -> Iterator[ProductRecord]:
+    """Reads the ProductRecords of a parquet file. source is a path or a binary file"""
+    parquet_file = pq.ParquetFile(source)
+    for index in range(parquet_file.num_row_groups):
+        yield from table_to_records(parquet_file.read_row_group(index))
+
+
+class ParquetPartitionWriter:
+    """Writes records into a parquet file, one row group every row_group_rows records."""
+
+    extension = ".parquet"
+
+    def __init__(self, file, row_group_rows: int = 10000, compression: str = "snappy"):
+        self.row_group_rows = row_group_rows
+        self._batch = ProductBatch()
+        self._writer = pq.ParquetWriter(file, SCHEMA, use_dictionary=DICTIONARY_COLUMNS, compression=compression)
+
+    def write(self, record: ProductRecord) -> None:
+        """Buffers the record and writes a row group once the buffer is full. Values that do not have the type of
+        their column are stored as null"""
+        self._batch.append(ProductRecord.typed(**record._asdict()))
+        if len(self._batch) >= self.row_group_rows:
+            self._write_row_group()
+
+    def finish(self) -> None:
+        """Writes the remaining records and the parquet footer. The writer is closed even if the last row group
+        fails, so that it does not write into the file after it has been closed"""
+        try:
+            if len(self._batch):
+                self._write_row_group()
+        finally:
+            self._writer.close()
+
+    def _write_row_group(self) -> None:
+        self._writer.write_table(batch_to_table(self._batch), row_group_size=len(self._batch))
+        self._batch.clear()
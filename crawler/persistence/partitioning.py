@@ -0,0 +1,139 @@
+"""Hive style partition layout of the output: every run writes its own partitions below
+<prefix>/client=<client>/date=<date>/run=<run_id>/, each with a _manifest.json that describes its files."""
+
+import json
+from typing import Iterable
+
+from crawler.item_factory.product_record import ProductRecord
+from crawler.persistence.csv_format import CsvPartitionWriter
+from crawler.persistence.sink import Sink, new_run_id
+
+MANIFEST_NAME = "_manifest.json"
+
+
+def partition_prefix(prefix: str, client: str, date: str, run_id: str) -> str:
+    """Returns the key prefix of a partition, ending with a slash"""
+    parts = [prefix.strip("/")] if prefix and prefix.strip("/") else []
+    parts += ["client=" + client, "date=" + date, "run=" + run_id]
+    return "/".join(parts) + "/"
+
+
+def parse_partition(key: str) -> dict:
+    """Returns the partition values (client, date, run) contained in a key"""
+    values = {}
+    for part in key.split("/"):
+        name, separator, value = part.partition("=")
+        if separator:
+            values[name] = value
+    return values
+
+
+def build_manifest(partition: dict, files: Iterable[dict], **extra) -> bytes:
+    """Creates the manifest of a partition. files contains one dictionary per data file with the keys key,
+    rows, bytes, min_timestamp and max_timestamp. extra values are added to the manifest."""
+    files = list(files)
+    manifest = {
+        "partition": partition,
+        "files": files,
+        "rows": sum(file["rows"] for file in files),
+        "min_timestamp": min((file["min_timestamp"] for file in files), default=None),
+        "max_timestamp": max((file["max_timestamp"] for file in files), default=None),
+    }
+    manifest.update(extra)
+    return json.dumps(manifest, indent=2).encode("utf-8")
+
+
+def get_writer_class(file_format: str):
+    """Returns the partition writer for the given file format. pyarrow is only imported if parquet is used."""
+    if file_format == "csv":
+        return CsvPartitionWriter
+    if file_format == "parquet":
+        from crawler.persistence.parquet_format import ParquetPartitionWriter
+        return ParquetPartitionWriter
+    raise ValueError("Unsupported storage format: " + str(file_format))
+
+
+class Partition:
+    """Data file and statistics of one partition of the run."""
+
+    def __init__(self, prefix: str, values: dict, file, writer):
+        self.prefix = prefix
+        self.values = values
+        self.file = file
+        self.writer = writer
+        self.rows = 0
+        self.min_timestamp = None
+        self.max_timestamp = None
+
+    def write(self, record: ProductRecord) -> None:
+        """Writes the record and updates the statistics"""
+        self.writer.write(record)
+        self.rows += 1
+        if self.min_timestamp is None or record.timestamp < self.min_timestamp:
+            self.min_timestamp = record.timestamp
+        if self.max_timestamp is None or record.timestamp > self.max_timestamp:
+            self.max_timestamp = record.timestamp
+
+    def file_info(self, key: str, size: int) -> dict:
+        """Returns the description of the data file for the manifest"""
+        return {
+            "key": key,
+            "rows": self.rows,
+            "bytes": size,
+            "min_timestamp": self.min_timestamp,
+            "max_timestamp": self.max_timestamp,
+        }
+
+
+class PartitionedSink(Sink):
+    """Writes the records of a run into one data file per partition. Subclasses decide where the files are
+    stored by implementing _open_file and _commit."""
+
+    def __init__(self, client: str, run_id: str = None, prefix: str = "products", file_format: str = "csv",
+                 writer_options: dict = None):
+        self.client = client
+        self.run_id = run_id or new_run_id()
+        self.prefix = prefix
+        self.writer_class = get_writer_class(file_format)
+        self.writer_options = writer_options or {}
+        self.file_name = "part-00000" + self.writer_class.extension
+        self.partitions = {}
+        self.closed = False
+
+    @property
+    def rows(self) -> int:
+        """Number of records written to the sink"""
+        return sum(partition.rows for partition in self.partitions.values())
+
+    def write(self, record: ProductRecord) -> None:
+        self._partition(record.date).write(record)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            for partition in self.partitions.values():
+                partition.writer.finish()
+                self._commit(partition, partition.prefix + self.file_name)
+        finally:
+            for partition in self.partitions.values():
+                partition.file.close()
+
+    def _partition(self, date: str) -> Partition:
+        partition = self.partitions.get(date)
+        if partition is None:
+            prefix = partition_prefix(self.prefix, self.client, date, self.run_id)
+            file = self._open_file(prefix + self.file_name)
+            values = {"client": self.client, "date": date, "run": self.run_id}
+            partition = Partition(prefix, values, file, self.writer_class(file, **self.writer_options))
+            self.partitions[date] = partition
+        return partition
+
+    def _open_file(self, key: str):
+        """Returns the binary file the data of the partition is written to"""
+        raise NotImplementedError
+
+    def _commit(self, partition: Partition, key: str) -> None:
+        """Stores the finished data file and the manifest of the partition"""
+        raise NotImplementedError
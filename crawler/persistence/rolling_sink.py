@@ -0,0 +1,157 @@
+"""Rolling, compressed csv output: RollingCsvSink rotates csv segments by size and day, compresses the closed segments
+and lists them in a segment index."""
+
+import gzip
+import io
+import json
+import logging
+import os
+import re
+import shutil
+from typing import List, Optional
+
+from crawler.item_factory.product_record import ProductRecord
+from crawler.persistence.csv_format import CsvFileSink
+from crawler.persistence.sink import Sink
+
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst", None: ""}
+_SEGMENT_NAME = re.compile(r"^(.+)-\d{4}-\d{2}-\d{2}-\d+\.csv(?:\.gz|\.zst)?$")
+
+
+class RollingCsvSink(Sink):
+    """Writes the records into rotating csv segments, which are compressed after they have been closed."""
+
+    def __init__(self, directory: str, client: str, max_bytes: int = 64 * 1024 * 1024, compression: str = "gzip",
+                 flush_rows: int = 100):
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError("Unsupported compression: " + str(compression))
+        self.directory = directory
+        self.client = client
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self.flush_rows = flush_rows
+        self.index_path = os.path.join(directory, client + "_segments.json")
+        self.index = _read_index(self.index_path)
+        self._active = None
+        active = self.index.get("active")
+        if active is not None:
+            self._open_segment(active["file"], active)
+
+    def write(self, record: ProductRecord) -> None:
+        date = record.date
+        if self._active is not None and self.index["active"]["date"] != date:
+            self._rotate()
+        if self._active is None:
+            self._open_segment(self._segment_name(date), {"date": date})
+        self._active.write(record)
+        active = self.index["active"]
+        active["rows"] += 1
+        if active["min_timestamp"] is None or record.timestamp < active["min_timestamp"]:
+            active["min_timestamp"] = record.timestamp
+        if active["max_timestamp"] is None or record.timestamp > active["max_timestamp"]:
+            active["max_timestamp"] = record.timestamp
+        if self._active.size >= self.max_bytes:
+            self._rotate()
+
+    def flush(self) -> None:
+        if self._active is not None:
+            self._active.flush()
+        _write_index(self.index_path, self.index)
+
+    def close(self) -> None:
+        if self._active is not None:
+            self._active.close()
+        _write_index(self.index_path, self.index)
+
+    def _open_segment(self, file_name: str, info: dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self.index["active"] = {
+            "file": file_name,
+            "date": info["date"],
+            "rows": info.get("rows", 0),
+            "min_timestamp": info.get("min_timestamp"),
+            "max_timestamp": info.get("max_timestamp"),
+        }
+        self._active = CsvFileSink(os.path.join(self.directory, file_name), flush_rows=self.flush_rows)
+
+    def _segment_name(self, date: str) -> str:
+        used = {segment["file"].split(".")[0] for segment in self.index["segments"]}
+        number = 0
+        while "%s-%s-%03d" % (self.client, date, number) in used:
+            number += 1
+        return "%s-%s-%03d.csv" % (self.client, date, number)
+
+    def _rotate(self) -> None:
+        self._active.close()
+        self._active = None
+        segment = self.index.pop("active")
+        path = os.path.join(self.directory, segment["file"])
+        if self.compression is not None:
+            compressed_path = path + COMPRESSION_SUFFIXES[self.compression]
+            _compress(path, compressed_path, self.compression)
+            os.remove(path)
+            segment["file"] = os.path.basename(compressed_path)
+            path = compressed_path
+        segment["bytes"] = os.path.getsize(path)
+        self.index["segments"].append(segment)
+        _write_index(self.index_path, self.index)
+        logging.debug("segment %s closed with %s rows", segment["file"], segment["rows"])
+
+
+def segments_in_range(directory: str, client: str, start: float = None, end: float = None) -> List[str]:
+    """Returns the paths of the closed segments of the client which contain records between start and end,
+    followed by the active segment"""
+    index = _read_index(os.path.join(directory, client + "_segments.json"))
+    segments = index["segments"] + ([index["active"]] if index.get("active") else [])
+    return [
+        os.path.join(directory, segment["file"]) for segment in segments
+        if segment["rows"]
+        and (start is None or segment["max_timestamp"] >= start)
+        and (end is None or segment["min_timestamp"] <= end)
+    ]
+
+
+def segment_client(file_name: str) -> Optional[str]:
+    """Returns the client of a segment name <client>-<date>-<number>.csv[.gz|.zst], None for other names"""
+    match = _SEGMENT_NAME.match(file_name)
+    return match.group(1) if match else None
+
+
+def open_segment(path: str):
+    """Opens a plain, gzip or zstd compressed segment for reading as text"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    if path.endswith(".zst"):
+        import zstandard
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        return io.TextIOWrapper(reader, encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def _compress(source: str, target: str, compression: str) -> None:
+    temporary = target + ".tmp"
+    with open(source, "rb") as source_file:
+        if compression == "gzip":
+            with gzip.open(temporary, "wb") as target_file:
+                shutil.copyfileobj(source_file, target_file)
+        else:
+            import zstandard
+            with open(temporary, "wb") as target_file:
+                zstandard.ZstdCompressor().copy_stream(source_file, target_file)
+    os.replace(temporary, target)
+
+
+def _read_index(path: str) -> dict:
+    if not os.path.exists(path):
+        return {"segments": []}
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _write_index(path: str, index: dict) -> None:
+    if not index["segments"] and not index.get("active"):
+        return
+    temporary = path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(index, file, indent=2)
+    os.replace(temporary, path)
@@ -0,0 +1,60 @@
+"""Buffered, partitioned S3 sink that uploads every partition of a run as one object on close."""
+
+import logging
+import tempfile
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+
+from crawler.persistence.partitioning import MANIFEST_NAME, Partition, PartitionedSink, build_manifest
+
+
+class S3Sink(PartitionedSink):
+    """Collects the records of a run and uploads one object per partition to the bucket."""
+
+    def __init__(self, bucket: str, client: str, run_id: str = None, prefix: str = "products", s3_client=None,
+                 spill_size: int = 8 * 1024 * 1024, multipart_threshold: int = 8 * 1024 * 1024,
+                 file_format: str = "csv", writer_options: dict = None):
+        super().__init__(client, run_id, prefix, file_format, writer_options)
+        self.bucket = bucket
+        self.s3_client = s3_client if s3_client is not None else boto3.client("s3")
+        self.spill_size = spill_size
+        self.transfer_config = TransferConfig(multipart_threshold=multipart_threshold)
+
+    @classmethod
+    def from_settings(cls, settings_dict: dict, run_id: str = None) -> "S3Sink":
+        """Creates the sink for the bucket, client and storage options given in the settings"""
+        storage = settings_dict.get("storage") or {}
+        file_format = storage.get("format", "csv")
+        return cls(
+            settings_dict["s3_bucket"],
+            settings_dict["client"],
+            run_id=run_id,
+            prefix=storage.get("s3_prefix", "products"),
+            s3_client=boto3.client("s3", endpoint_url=storage.get("s3_endpoint_url")),
+            spill_size=storage.get("s3_spill_size", 8 * 1024 * 1024),
+            multipart_threshold=storage.get("s3_multipart_threshold", 8 * 1024 * 1024),
+            file_format=file_format,
+            writer_options=writer_options_from_settings(storage),
+        )
+
+    def flush(self) -> None:
+        """Records are only uploaded on close, because an S3 object can not be appended to."""
+
+    def _open_file(self, key: str):
+        return tempfile.SpooledTemporaryFile(max_size=self.spill_size, mode="w+b")
+
+    def _commit(self, partition: Partition, key: str) -> None:
+        size = partition.file.tell()
+        partition.file.seek(0)
+        logging.debug("uploading %s rows to bucket %s with key %s", partition.rows, self.bucket, key)
+        self.s3_client.upload_fileobj(partition.file, self.bucket, key, Config=self.transfer_config)
+        manifest = build_manifest(partition.values, [partition.file_info(key, size)])
+        self.s3_client.put_object(Bucket=self.bucket, Key=partition.prefix + MANIFEST_NAME, Body=manifest)
+
+
+def writer_options_from_settings(storage: dict) -> dict:
+    """Returns the options of the partition writer for the configured format"""
+    if storage.get("format", "csv") == "parquet":
+        return {"row_group_rows": storage.get("parquet_row_group_rows", 10000)}
+    return {}
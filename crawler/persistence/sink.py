@@ -0,0 +1,56 @@
+"""Base classes of the storage sinks. A sink is created once per crawl and must be closed at the end of the run, so
+buffered records are written out."""
+
+import uuid
+from datetime import datetime
+from typing import Iterable
+
+from crawler.item_factory.product_record import ProductRecord
+
+
+class Sink:
+    """A sink receives records via write() and stores them on flush() and close()."""
+
+    def write(self, record: ProductRecord) -> None:
+        """Receives one record to be stored"""
+        raise NotImplementedError
+
+    def write_batch(self, records: Iterable[ProductRecord]) -> None:
+        """Receives several records to be stored"""
+        for record in records:
+            self.write(record)
+
+    def flush(self) -> None:
+        """Stores all buffered records"""
+
+    def close(self) -> None:
+        """Stores all buffered records and releases the resources of the sink"""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class WrappingSink(Sink):
+    """A sink that passes the records on to another sink. Subclasses extend write(), flush() and close() and call
+    the methods of the base class to forward to the wrapped sink."""
+
+    def __init__(self, sink: Sink):
+        self.sink = sink
+
+    def write(self, record: ProductRecord) -> None:
+        self.sink.write(record)
+
+    def flush(self) -> None:
+        self.sink.flush()
+
+    def close(self) -> None:
+        self.sink.close()
+
+
+def new_run_id() -> str:
+    """Returns a unique, sortable id for the current crawl run"""
+    return datetime.now().strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
@@ -0,0 +1,112 @@
+"""SQLite price history: SqliteSink stores the records of all runs in one database, PriceHistory queries it."""
+
+import sqlite3
+from typing import List, Optional, Tuple
+
+from crawler.item_factory.product_record import FLOAT_FIELDS, ProductRecord
+from crawler.persistence.sink import Sink
+
+COLUMNS = ("client",) + ProductRecord._fields
+
+_COLUMN_TYPES = {
+    "client": "TEXT NOT NULL",
+    "timestamp": "REAL NOT NULL",
+    "prime": "INTEGER",
+    "sold_by_amazon": "INTEGER",
+    "amazon_choice": "INTEGER",
+    "number_of_reviews": "INTEGER",
+}
+
+_BOOL_FIELDS = ("prime", "sold_by_amazon", "amazon_choice")
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Opens the database in WAL mode and creates the table and index if necessary"""
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    column_definitions = ", ".join(
+        column + " " + _COLUMN_TYPES.get(column, "REAL" if column in FLOAT_FIELDS else "TEXT")
+        for column in COLUMNS
+    )
+    connection.execute("CREATE TABLE IF NOT EXISTS products (" + column_definitions + ")")
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS products_asin_client_timestamp ON products (asin, client, timestamp)"
+    )
+    connection.commit()
+    return connection
+
+
+class SqliteSink(Sink):
+    """Inserts the records of a run into the products table, batch_size records per transaction."""
+
+    def __init__(self, path: str, client: str, batch_size: int = 500):
+        self.path = path
+        self.client = client
+        self.batch_size = batch_size
+        self.connection = connect(path)
+        self._rows = []
+        self._insert = "INSERT INTO products (%s) VALUES (%s)" % (
+            ", ".join(COLUMNS), ", ".join("?" * len(COLUMNS))
+        )
+
+    def write(self, record: ProductRecord) -> None:
+        self._rows.append((self.client,) + tuple(record))
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._rows:
+            return
+        with self.connection:
+            self.connection.executemany(self._insert, self._rows)
+        self._rows = []
+
+    def close(self) -> None:
+        self.flush()
+        self.connection.close()
+
+
+class PriceHistory:
+    """Query API on the database written by SqliteSink."""
+
+    def __init__(self, path: str):
+        self.connection = connect(path)
+
+    def price_series(self, asin: str, client: str, start: float = None,
+                     end: float = None) -> List[Tuple[float, Optional[float]]]:
+        """Returns (timestamp, current_price) of the asin on the client, ordered by time. start and end are
+        optional unix timestamps limiting the period"""
+        return self.connection.execute(
+            "SELECT timestamp, current_price FROM products "
+            "WHERE asin = ? AND client = ? AND timestamp >= ? AND timestamp <= ? ORDER BY timestamp",
+            (asin, client, start if start is not None else float("-inf"), end if end is not None else float("inf")),
+        ).fetchall()
+
+    def latest(self, asin: str, client: str) -> Optional[ProductRecord]:
+        """Returns the most recent record of the asin on the client"""
+        row = self.connection.execute(
+            "SELECT " + ", ".join(ProductRecord._fields) + " FROM products "
+            "WHERE asin = ? AND client = ? ORDER BY timestamp DESC LIMIT 1",
+            (asin, client),
+        ).fetchone()
+        return _to_record(row) if row is not None else None
+
+    def latest_prices(self, asin: str) -> dict:
+        """Returns the most recent (timestamp, current_price) of the asin for every client"""
+        rows = self.connection.execute(
+            "SELECT client, MAX(timestamp), current_price FROM products WHERE asin = ? GROUP BY client",
+            (asin,),
+        ).fetchall()
+        return {client: (timestamp, price) for client, timestamp, price in rows}
+
+    def close(self) -> None:
+        """Closes the database connection"""
+        self.connection.close()
+
+
+def _to_record(row: tuple) -> ProductRecord:
+    record = ProductRecord._make(row)
+    return record._replace(**{
+        field: bool(getattr(record, field)) for field in _BOOL_FIELDS if getattr(record, field) is not None
+    })
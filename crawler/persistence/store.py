@@ -1,114 +1,103 @@
 """Stores the product as csv or in S3
 
-    receives a product_dict with all values and the settings_dict
+    receives a ProductRecord with all values and the settings_dict
     with the wanted settings e.g. where to store"""
 
-import csv
-from os.path import exists
+import os
 import logging
-import boto3
-from botocore.exceptions import ClientError
+from crawler.item_factory.product_record import ProductBatch, ProductRecord
+from crawler.persistence.aggregate_sink import AggregateSink
+from crawler.persistence.async_sink import AsyncSink
+from crawler.persistence.csv_format import CsvFileSink
+from crawler.persistence.dedup_sink import DedupSink
+from crawler.persistence.delta_sink import DeltaSink
+from crawler.persistence.latest_store import LatestSnapshotSink
+from crawler.persistence.partitioning import MANIFEST_NAME, Partition, PartitionedSink, build_manifest
+from crawler.persistence.rolling_sink import RollingCsvSink
+from crawler.persistence.s3_sink import S3Sink, writer_options_from_settings
+from crawler.persistence.sink import Sink
+from crawler.persistence.sqlite_store import SqliteSink
 
 
-def store_item(product_dict: dict, settings_dict: dict) -> None:
-    """Method receives an item to be stored. It uses environment variables to determine
-    whether storage in AWS S3 bucket or local in csv file is required"""
-    logging.debug("store_item_methode gestartet")
+def create_sink(settings_dict: dict, run_id: str = None) -> Sink:
+    """Creates the sink that stores the records of one crawl run. It uses environment variables to determine
+    whether storage in AWS S3 bucket or local in csv file is required. With storage.delta only changed
+    observations are stored, with storage.aggregates running price aggregates are updated for every
+    observation, with storage.dedup duplicate observations are dropped, with storage.latest the
+    newest record per product is also kept in a snapshot store and with storage.async the records are written
+    by a background worker."""
+    sink = create_backend(settings_dict, run_id)
+    storage = settings_dict.get("storage") or {}
+    if storage.get("delta", False):
+        sink = DeltaSink.from_settings(sink, settings_dict)
+    if storage.get("aggregates", False):
+        sink = AggregateSink.from_settings(sink, settings_dict)
+    if storage.get("dedup", False):
+        sink = DedupSink.from_settings(sink, settings_dict)
+    if storage.get("latest"):
+        sink = LatestSnapshotSink.from_settings(sink, settings_dict)
+    if storage.get("async", False):
+        sink = AsyncSink(sink, queue_size=storage.get("async_queue_size", 1000),
+                         batch_size=storage.get("async_batch_size", 100))
+    return sink
+
+
+def create_backend(settings_dict: dict, run_id: str = None) -> Sink:
+    """Creates the sink of the configured storage backend"""
     if settings_dict["aws_env"]:
-        logging.debug("store_to_s3 gestartet")
-        store_to_s3(product_dict, settings_dict)
-    else:
-        filepath = "../output/" + settings_dict["client"] + ".csv"
-        store_to_csv(product_dict, filepath)
+        logging.debug("S3Sink erstellt")
+        return S3Sink.from_settings(settings_dict, run_id)
+    storage = settings_dict.get("storage") or {}
+    if storage.get("format", "csv") == "csv":
+        return CsvFileSink.from_settings(settings_dict)
+    if storage["format"] == "rolling_csv":
+        return RollingCsvSink(
+            storage.get("output_directory", "../output"),
+            settings_dict["client"],
+            max_bytes=storage.get("rolling_max_bytes", 64 * 1024 * 1024),
+            compression=storage.get("rolling_compression", "gzip"),
+            flush_rows=storage.get("csv_flush_rows", 100),
+        )
+    if storage["format"] == "sqlite":
+        return SqliteSink(storage.get("sqlite_path", "../output/price_history.db"), settings_dict["client"],
+                          batch_size=storage.get("sqlite_batch_size", 500))
+    return PartitionedFileSink(
+        storage.get("output_directory", "../output"),
+        settings_dict["client"],
+        run_id=run_id,
+        file_format=storage["format"],
+        writer_options=writer_options_from_settings(storage),
+    )
+
 
+class PartitionedFileSink(PartitionedSink):
+    """Writes the records of a run into partitioned files below a local directory, using the same layout as
+    the S3Sink."""
 
-def store_to_csv(product: dict, filepath: str):
-    """Gets called by store_item with a dictionary containing product information
-    and stores the product as a line in a csv file"""
-    file_exists = exists(filepath)
-    with open(filepath, 'a', encoding='utf-8', newline='') as file:
-        # also need to configure the headers
-        writer = csv.writer(file)
-        header_list = ['timestamp',
-                       'date',
-                       'time',
-                       'name',
-                       'current_price',
-                       'price_regular',
-                       'prime',
-                       'discount_in_euros',
-                       'percent_discount',
-                       'sold_by_amazon',
-                       'seller',
-                       'amazon_choice',
-                       'asin',
-                       'url']
-        if file_exists:
-            pass
-        else:
-            writer.writerow(header_list)
+    def __init__(self, directory: str, client: str, run_id: str = None, prefix: str = "products",
+                 file_format: str = "csv", writer_options: dict = None):
+        super().__init__(client, run_id, prefix, file_format, writer_options)
+        self.directory = directory
 
-        write_values = []
-        for header in header_list:
-            value = product[header]
-            if isinstance(value, str):
-                value = value.replace(",", "")
-                value = value.replace('"', '').replace("'", '')
-                value.strip()
-            write_values.append(value)
-        writer.writerow(write_values)
-        file.close()
+    def _open_file(self, key: str):
+        path = os.path.join(self.directory, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return open(path, "wb")
 
+    def _commit(self, partition: Partition, key: str) -> None:
+        partition.file.flush()
+        manifest = build_manifest(partition.values, [partition.file_info(key, partition.file.tell())])
+        with open(os.path.join(self.directory, partition.prefix + MANIFEST_NAME), "wb") as file:
+            file.write(manifest)
 
-def store_to_s3(product_dict: dict, settings_dict: dict) -> None:
-    """Method gets an product dictionary and the name of the used client. Items from the product_dict are then
-    stored in S3 in CSV format."""
-    bucket_name = settings_dict["s3_bucket"]
-    s3_filename = "%s_lambda.csv", settings_dict["client"]
-    local_file = "/tmp/download.csv"
-    s3 = boto3.resource("s3")
-    logging.debug("writing to bucket %s with filename %s", bucket_name, s3_filename)
-    headers = [
-        "timestamp",
-        "date",
-        "time",
-        "name",
-        "current_price",
-        "price_regular",
-        "prime",
-        "discount_in_euros",
-        "percent_discount",
-        "sold_by_amazon",
-        "seller",
-        "amazon_choice",
-        "asin",
-        "url",
-    ]
-    body = ""
 
-    for item in headers:
-        body += str(product_dict[item]).replace(',', '').replace('"', '').replace("'", '')
-        if item != headers[-1]:
-            body += ","
-    body += "\n"
+def store_to_csv(record: ProductRecord, filepath: str):
+    """Stores the product as a line in a csv file. Use a CsvFileSink to store all records of a run."""
+    with CsvFileSink(filepath) as sink:
+        sink.write(record)
 
-    try:
-        s3.Bucket(bucket_name).download_file(s3_filename, local_file)
-    except ClientError as ex:
-        if ex.response["Error"]["Code"] == "404":
-            print("The object does not exist.")
-        else:
-            raise
-    with open(local_file, mode="a+", encoding="utf-8") as file:
-        empty_test_char = file.read(1)
-        if empty_test_char:
-            column_names = ""
-            for item in headers:
-                column_names += item
-                if item != headers[-1]:
-                    column_names += ","
-            column_names += "\n"
-            file.write(column_names)
-        file.write(body)
 
-    s3.meta.client.upload_file(local_file, bucket_name, s3_filename)
+def store_batch_to_csv(batch: ProductBatch, filepath: str):
+    """Stores all records of a ProductBatch in a csv file"""
+    with CsvFileSink(filepath) as sink:
+        sink.write_batch(batch)
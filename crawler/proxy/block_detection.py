@@ -0,0 +1,82 @@
+"""Early detection of blocked requests from the status, the headers and the first bytes of a streamed response."""
+
+from typing import Iterable
+
+from crawler.exceptions.proxy_exception import ProxyGotBlockedError
+
+PRODUCT_MARKERS = (b"(MEOW)",)
+BLOCK_SIGNATURES = (
+    b"/errors/validatecaptcha",
+    b"robot check",
+    b"captchacharacters",
+    b"type the characters you see in this image",
+    b"geben sie die angezeigten zeichen im bild ein",
+    b"api-services-support@amazon.com",
+)
+BLOCK_STATUSES = (403, 429, 503)
+
+
+class BodyScan:
+    """Scans one streamed body for block signatures and the product marker."""
+
+    def __init__(self, classifier: "BlockClassifier"):
+        self.classifier = classifier
+        self.received = 0
+        self.marker_found = False
+        self._head = b""
+        self._tail = b""
+
+    def feed(self, chunk: bytes) -> None:
+        """Scans the next chunk of the body. Raises ProxyGotBlockedError as soon as a block signature is found"""
+        classifier = self.classifier
+        if not self.marker_found and self.received < classifier.scan_bytes:
+            self._head += chunk[:classifier.scan_bytes - self.received]
+            head = self._head.lower()
+            for signature in classifier.signatures:
+                if signature in head:
+                    raise ProxyGotBlockedError("Block signature %r in the response" % signature.decode())
+        self.received += len(chunk)
+        if self.marker_found:
+            return
+        window = self._tail + chunk
+        if any(marker in window for marker in classifier.markers):
+            self.marker_found = True
+            self._tail = b""
+        else:
+            self._tail = window[-classifier.overlap:] if classifier.overlap else b""
+
+    def finish(self) -> None:
+        """Raises ProxyGotBlockedError if the complete body did not contain the product marker"""
+        if not self.marker_found:
+            raise ProxyGotBlockedError("No product marker in the response")
+
+
+class BlockClassifier:
+    """Signatures of blocked and of valid responses."""
+
+    def __init__(self, markers: Iterable[bytes] = PRODUCT_MARKERS, signatures: Iterable[bytes] = BLOCK_SIGNATURES,
+                 statuses: Iterable[int] = BLOCK_STATUSES, scan_bytes: int = 8192):
+        self.markers = tuple(markers)
+        self.signatures = tuple(signature.lower() for signature in signatures)
+        self.statuses = frozenset(statuses)
+        self.scan_bytes = scan_bytes
+        self.overlap = max((len(marker) for marker in self.markers), default=1) - 1
+
+    @classmethod
+    def from_settings(cls, settings: dict) -> "BlockClassifier":
+        """Creates the classifier given in the proxy settings, additional signatures are added to the defaults"""
+        settings = settings or {}
+        extra = [signature.encode("utf-8") for signature in settings.get("block_signatures") or []]
+        return cls(signatures=BLOCK_SIGNATURES + tuple(extra), scan_bytes=settings.get("block_scan_bytes", 8192))
+
+    def check_head(self, status: int, headers: dict, url: str = "") -> None:
+        """Raises ProxyGotBlockedError if the status, the headers or the (redirected) url already show a block"""
+        if status in self.statuses:
+            raise ProxyGotBlockedError("Block status %s" % status)
+        for target in (headers.get("Location") or "", url or ""):
+            if any(signature in target.lower().encode("utf-8") for signature in self.signatures):
+                raise ProxyGotBlockedError("Redirect to %s" % target)
+
+    def scan(self) -> BodyScan:
+        """Starts the scan of a body"""
+        return BodyScan(self)
@@ -0,0 +1,152 @@
+"""Streaming download of a response with a wall-clock deadline and a minimum transfer rate."""
+
+import socket
+import threading
+import time
+from typing import Optional
+
+from crawler.exceptions.proxy_exception import SlowProxyError
+
+
+class DownloadCancelled(Exception):
+    """The download was cancelled, its result is not needed anymore."""
+
+
+class TransferLimits:
+    """Deadline and minimum transfer rate of a download."""
+
+    def __init__(self, deadline: float = 4.0, min_rate: float = 50_000.0, grace_seconds: float = 0.5,
+                 chunk_size: int = 16384):
+        self.deadline = deadline
+        self.min_rate = min_rate
+        self.grace_seconds = grace_seconds
+        self.chunk_size = chunk_size
+
+    @classmethod
+    def from_settings(cls, settings: dict) -> "TransferLimits":
+        """Creates the limits given in the proxy settings"""
+        settings = settings or {}
+        return cls(
+            deadline=settings.get("request_deadline", 4.0),
+            min_rate=settings.get("min_transfer_rate", 50_000.0),
+            grace_seconds=settings.get("transfer_grace_seconds", 0.5),
+        )
+
+    @property
+    def connect_timeout(self) -> float:
+        """Timeout of the connection to the proxy. Together with the read timeout it fits into the deadline"""
+        return min(3.0, self.deadline / 2)
+
+    @property
+    def read_timeout(self) -> float:
+        """Timeout of a single socket read, so the headers arrive within the deadline"""
+        return min(3.0, self.deadline / 2)
+
+
+def read_body(response, start_time: float, limits: TransferLimits, cancel: threading.Event = None,
+              clock=time.time, scan=None) -> bytes:
+    """Reads the body of a streamed response within the limits. Raises SlowProxyError or DownloadCancelled, or
+    ProxyGotBlockedError from the scan. The rate is measured in bytes on the wire, which differ from the decoded
+    bytes if the body is compressed, from the arrival of the headers on. When the deadline has passed, the
+    connection is shut down, so a read that is still waiting for data returns"""
+    wire_bytes = _wire_counter(response)
+    expected = int(response.headers.get("Content-Length") or 0) or None
+    if wire_bytes is None and response.headers.get("Content-Encoding"):
+        expected = None
+    watchdog = _Watchdog(response, limits.deadline - (clock() - start_time))
+    try:
+        body = _read_chunks(response, start_time, limits, cancel, clock, scan, wire_bytes, expected)
+    except Exception:
+        if watchdog.fired:
+            raise SlowProxyError("Request exceeded the deadline of %s seconds" % limits.deadline)
+        raise
+    finally:
+        watchdog.cancel()
+    if scan is not None:
+        scan.finish()
+    return body
+
+
+def _read_chunks(response, start_time: float, limits: TransferLimits, cancel: threading.Event, clock, scan,
+                 wire_bytes, expected: Optional[int]) -> bytes:
+    """Reads the chunks of the body and checks the deadline and the transfer rate after every chunk"""
+    chunks = []
+    received = 0
+    transfer_start = clock()
+    for chunk in _iter_chunks(response, limits.chunk_size):
+        if cancel is not None and cancel.is_set():
+            raise DownloadCancelled()
+        if scan is not None:
+            scan.feed(chunk)
+        chunks.append(chunk)
+        received = wire_bytes() if wire_bytes is not None else received + len(chunk)
+        now = clock()
+        elapsed = now - start_time
+        if elapsed > limits.deadline:
+            raise SlowProxyError("Request exceeded the deadline of %s seconds after %s bytes"
+                                 % (limits.deadline, received))
+        transfer_time = now - transfer_start
+        if transfer_time < limits.grace_seconds or (expected is not None and received >= expected):
+            continue
+        rate = received / transfer_time
+        if rate < limits.min_rate:
+            raise SlowProxyError("Transfer rate of %d bytes per second is too low" % rate)
+        if expected is not None and elapsed + (expected - received) / rate > limits.deadline:
+            raise SlowProxyError("Transfer of %s bytes cannot finish before the deadline" % expected)
+    return b"".join(chunks)
+
+
+def _iter_chunks(response, chunk_size: int):
+    """Yields the decoded body as soon as data arrives, in chunks of at most chunk_size bytes. Raw responses
+    without read1 (urllib3 before 2.0) are read in full chunks"""
+    read1 = getattr(response.raw, "read1", None)
+    if read1 is None:
+        yield from response.iter_content(chunk_size=chunk_size)
+        return
+    while True:
+        chunk = read1(chunk_size, decode_content=True)
+        if not chunk:
+            return
+        yield chunk
+
+
+class _Watchdog:
+    """Shuts the connection of a response down after the given number of seconds."""
+
+    def __init__(self, response, seconds: float):
+        self.fired = False
+        self._socket = getattr(getattr(getattr(response, "raw", None), "_connection", None), "sock", None)
+        self._timer = None
+        if isinstance(self._socket, socket.socket):
+            self._timer = threading.Timer(max(0.0, seconds), self._fire)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _fire(self) -> None:
+        self.fired = True
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def cancel(self) -> None:
+        """Stops the watchdog"""
+        if self._timer is not None:
+            self._timer.cancel()
+
+
+def _wire_counter(response):
+    """Returns a function that counts the bytes of the body read from the connection, or None if the raw response
+    does not provide it"""
+    tell = getattr(getattr(response, "raw", None), "tell", None)
+    return tell if callable(tell) else None
+
+
+def declared_encoding(headers) -> Optional[str]:
+    """Returns the charset declared in the Content-Type header or None. Unlike requests, text/html without charset
+    is not assumed to be ISO-8859-1, so the meta tag of the page can decide"""
+    for parameter in (headers.get("Content-Type") or "").split(";")[1:]:
+        name, _, value = parameter.partition("=")
+        if name.strip().lower() == "charset" and value.strip(" \"'"):
+            return value.strip(" \"'")
+    return None
@@ -0,0 +1,60 @@
+"""Hedged requests: the hedge delay from the recent request latencies and a budget that limits the share of hedged
+requests."""
+
+import threading
+from collections import deque
+
+
+class LatencyTracker:
+    """Percentile of the latencies of the last window successful requests."""
+
+    def __init__(self, percentile: float = 95.0, window: int = 200, default_delay: float = 1.0,
+                 min_delay: float = 0.05, min_samples: int = 10):
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, latency: float) -> None:
+        """Records the latency of a successful request"""
+        with self._lock:
+            self._latencies.append(latency)
+
+    def delay(self) -> float:
+        """Returns the hedge delay: the percentile of the recorded latencies, default_delay until min_samples
+        latencies are recorded"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.default_delay
+            latencies = sorted(self._latencies)
+        index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100.0))
+        return max(latencies[index], self.min_delay)
+
+
+class HedgeBudget:
+    """Token bucket that limits the share of hedged requests."""
+
+    def __init__(self, ratio: float = 0.1, burst: float = 5.0):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+        self.requests = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def record_request(self) -> None:
+        """Earns the tokens of one request"""
+        with self._lock:
+            self.requests += 1
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        """Takes the token of one hedge, returns False if the budget is exhausted"""
+        with self._lock:
+            if self.tokens < 1.0:
+                return False
+            self.tokens -= 1.0
+            self.hedges += 1
+            return True
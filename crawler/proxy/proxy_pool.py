@@ -0,0 +1,244 @@
+"""Scored pool of proxies with a circuit breaker per proxy."""
+
+import logging
+import random
+import threading
+import time
+from typing import Dict, Iterable, List
+
+from crawler.exceptions.proxy_exception import ProxyListIsEmptyError
+
+POLICIES = ("p2c", "weighted")
+
+
+class ProxyStats:
+    """Health of one proxy."""
+
+    __slots__ = ("latency", "success_rate", "block_rate", "requests", "consecutive_failures", "quarantines",
+                 "quarantined_until", "probing")
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.success_rate = 1.0
+        self.block_rate = 0.0
+        self.requests = 0
+        self.consecutive_failures = 0
+        self.quarantines = 0
+        self.quarantined_until = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        """State of the circuit breaker: closed, open or half-open"""
+        if self.quarantined_until is None:
+            return "closed"
+        return "half-open" if self.probing else "open"
+
+    @property
+    def score(self) -> float:
+        """Expected useful responses per second"""
+        return self.success_rate * (1.0 - self.block_rate) / max(self.latency, 0.001)
+
+    def to_dict(self) -> dict:
+        """Returns the statistics as dictionary, e.g. for logging"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class ProxyPool:
+    """Proxies with their statistics. choose() prefers proxies with a high score, either by comparing two random
+    proxies (p2c) or by drawing one weighted by score (weighted). A proxy that fails max_failures times in a row is
+    quarantined for quarantine_seconds, doubled with every further quarantine up to max_quarantine_seconds; after
+    that it gets one probe request and rejoins the pool if the probe succeeds. All methods are thread-safe. clock and
+    sleep can be replaced in tests, without sleep choose() waits on a condition that is notified when a proxy becomes
+    available."""
+
+    def __init__(self, proxies: Iterable[str] = (), policy: str = "p2c", alpha: float = 0.2,
+                 initial_latency: float = 1.0, max_failures: int = 3, quarantine_seconds: float = 30.0,
+                 max_quarantine_seconds: float = 1800.0, max_wait_seconds: float = 60.0, rng: random.Random = None,
+                 clock=time.monotonic, sleep=None):
+        if policy not in POLICIES:
+            raise ValueError("Unknown proxy selection policy: " + policy)
+        self.policy = policy
+        self.alpha = alpha
+        self.initial_latency = initial_latency
+        self.max_failures = max_failures
+        self.quarantine_seconds = quarantine_seconds
+        self.max_quarantine_seconds = max_quarantine_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self.rng = rng if rng is not None else random.Random()
+        self.clock = clock
+        self.sleep = sleep
+        self.stats: Dict[str, ProxyStats] = {}
+        self._proxies: List[str] = []
+        self._quarantined: List[str] = []
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        for proxy in proxies:
+            self.add(proxy)
+
+    @classmethod
+    def from_settings(cls, proxies: Iterable[str], settings: dict) -> "ProxyPool":
+        """Creates the pool with the policy and weights given in the proxy settings"""
+        settings = settings or {}
+        return cls(
+            proxies,
+            policy=settings.get("selection_policy", "p2c"),
+            alpha=settings.get("ewma_alpha", 0.2),
+            initial_latency=settings.get("initial_latency", 1.0),
+            max_failures=settings.get("max_failures", 3),
+            quarantine_seconds=settings.get("quarantine_seconds", 30.0),
+            max_quarantine_seconds=settings.get("max_quarantine_seconds", 1800.0),
+            max_wait_seconds=settings.get("max_wait_seconds", 60.0),
+        )
+
+    def __len__(self) -> int:
+        """Number of proxies that are not quarantined"""
+        return len(self._proxies)
+
+    def __contains__(self, proxy: str) -> bool:
+        return proxy in self.stats
+
+    def proxies(self) -> List[str]:
+        """Returns the proxies of the pool that are not quarantined"""
+        with self._lock:
+            return list(self._proxies)
+
+    def quarantined(self) -> List[str]:
+        """Returns the quarantined proxies"""
+        with self._lock:
+            return list(self._quarantined)
+
+    def add(self, proxy: str, latency: float = None) -> bool:
+        """Adds a proxy, optionally with a measured latency. Returns False if it is already in the pool"""
+        with self._lock:
+            if proxy in self.stats:
+                return False
+            self.stats[proxy] = ProxyStats(latency if latency is not None else self.initial_latency)
+            self._proxies.append(proxy)
+            self._available.notify_all()
+            return True
+
+    def remove(self, proxy: str) -> None:
+        """Removes a proxy from the pool"""
+        with self._lock:
+            stats = self.stats.pop(proxy, None)
+            if stats is not None:
+                (self._proxies if stats.quarantined_until is None else self._quarantined).remove(proxy)
+
+    def choose(self) -> str:
+        """Returns the proxy for the next request. A proxy whose quarantine is over is returned as probe first.
+        Raises ProxyListIsEmptyError if the pool is empty or no proxy is available within max_wait_seconds"""
+        start = self.clock()
+        with self._available:
+            while True:
+                now = self.clock()
+                probe = self._next_probe(now)
+                if probe is not None:
+                    return probe
+                if self._proxies:
+                    return self._select()
+                if not self._quarantined:
+                    raise ProxyListIsEmptyError
+                waiting = [self.stats[proxy].quarantined_until - now for proxy in self._quarantined
+                           if not self.stats[proxy].probing]
+                remaining = self.max_wait_seconds - (now - start)
+                if remaining <= 0:
+                    raise ProxyListIsEmptyError("Alle Proxies in Quarantaene!")
+                wait = min(max(min(waiting), 0.0) if waiting else 0.1, remaining)
+                if self.sleep is not None:
+                    self.sleep(wait)
+                else:
+                    self._available.wait(wait)
+
+    def choose_other(self, exclude: Iterable[str]):
+        """Returns a proxy that is not quarantined and not in exclude, e.g. for a second request of the same url, or
+        None if there is none. Does not wait"""
+        exclude = set(exclude)
+        with self._lock:
+            candidates = [proxy for proxy in self._proxies if proxy not in exclude]
+            return self._select(candidates) if candidates else None
+
+    def _next_probe(self, now: float):
+        for proxy in self._quarantined:
+            stats = self.stats[proxy]
+            if not stats.probing and stats.quarantined_until <= now:
+                stats.probing = True
+                return proxy
+        return None
+
+    def _select(self, candidates: List[str] = None) -> str:
+        candidates = candidates if candidates is not None else self._proxies
+        if len(candidates) == 1:
+            return candidates[0]
+        if self.policy == "p2c":
+            first, second = self.rng.sample(candidates, 2)
+            return first if self.stats[first].score >= self.stats[second].score else second
+        weights = [self.stats[proxy].score for proxy in candidates]
+        return self.rng.choices(candidates, weights=weights)[0]
+
+    def report_success(self, proxy: str, latency: float) -> None:
+        """Records a valid response"""
+        self._update(proxy, latency=latency, success=True, blocked=False, failed=False)
+
+    def report_slow(self, proxy: str, latency: float) -> None:
+        """Records a response that missed the deadline. The success rate is not affected, but for the circuit
+        breaker it counts as failure, so a proxy that always misses the deadline is quarantined"""
+        self._update(proxy, latency=latency, success=None, blocked=False, failed=True)
+
+    def report_blocked(self, proxy: str, latency: float = None) -> None:
+        """Records a response that shows the proxy is blocked"""
+        self._update(proxy, latency=latency, success=False, blocked=True, failed=True)
+
+    def report_error(self, proxy: str) -> None:
+        """Records a request that failed, e.g. with a timeout or a connection error"""
+        self._update(proxy, latency=None, success=False, blocked=False, failed=True)
+
+    def release_probe(self, proxy: str) -> None:
+        """Returns the probe of a half-open proxy whose request was cancelled without result, so the proxy is probed
+        again by the next choose()"""
+        with self._lock:
+            stats = self.stats.get(proxy)
+            if stats is None or not stats.probing:
+                return
+            stats.probing = False
+            stats.quarantined_until = self.clock()
+            self._available.notify_all()
+
+    def _update(self, proxy: str, latency, success, blocked: bool, failed: bool) -> None:
+        with self._lock:
+            stats = self.stats.get(proxy)
+            if stats is None:
+                return
+            alpha = self.alpha
+            stats.requests += 1
+            if latency is not None:
+                stats.latency = alpha * latency + (1 - alpha) * stats.latency
+            stats.block_rate = alpha * float(blocked) + (1 - alpha) * stats.block_rate
+            if success is not None:
+                stats.success_rate = alpha * float(success) + (1 - alpha) * stats.success_rate
+            stats.consecutive_failures = stats.consecutive_failures + 1 if failed else 0
+            if stats.probing:
+                stats.probing = False
+                if failed:
+                    self._quarantine(proxy, stats)
+                else:
+                    self._rejoin(proxy, stats)
+            elif stats.quarantined_until is None and stats.consecutive_failures >= self.max_failures:
+                self._proxies.remove(proxy)
+                self._quarantined.append(proxy)
+                self._quarantine(proxy, stats)
+
+    def _quarantine(self, proxy: str, stats: ProxyStats) -> None:
+        stats.quarantines += 1
+        seconds = min(self.quarantine_seconds * 2 ** (stats.quarantines - 1), self.max_quarantine_seconds)
+        stats.quarantined_until = self.clock() + seconds
+        logging.info("Proxy %s quarantined for %s seconds", proxy, seconds)
+
+    def _rejoin(self, proxy: str, stats: ProxyStats) -> None:
+        stats.quarantines = 0
+        stats.quarantined_until = None
+        stats.consecutive_failures = 0
+        self._quarantined.remove(proxy)
+        self._proxies.append(proxy)
+        self._available.notify_all()
+        logging.info("Proxy %s rejoined the pool", proxy)
@@ -0,0 +1,74 @@
+"""Background refresh of the proxy pool with new, validated proxies from the proxy sources."""
+
+import logging
+import threading
+import time
+from typing import Dict, Iterable
+
+from crawler.proxy.proxy_pool import ProxyPool
+from crawler.proxy.proxy_sources import fetch_proxies, sources_from_settings
+from crawler.proxy.proxy_validation import validate_from_settings
+
+
+class ProxyRefresher:
+    """Adds new proxies from the sources to the pool in a background thread."""
+
+    def __init__(self, pool: ProxyPool, sources: Iterable, interval: float = 300.0, validation: dict = None,
+                 source_timeout: float = 10.0, reject_seconds: float = 3600.0):
+        self.pool = pool
+        self.sources = list(sources)
+        self.interval = interval
+        self.validation = validation
+        self.source_timeout = source_timeout
+        self.reject_seconds = reject_seconds
+        self.rejected: Dict[str, float] = {}
+        self.added = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="proxy-refresher", daemon=True)
+
+    @classmethod
+    def from_settings(cls, pool: ProxyPool, settings: dict) -> "ProxyRefresher":
+        """Creates the refresher with the sources, interval and validation given in the proxy settings"""
+        return cls(
+            pool,
+            sources_from_settings(settings),
+            interval=settings.get("refresh_interval", 300.0),
+            validation=settings if settings.get("canary_url") else None,
+            source_timeout=settings.get("source_timeout", 10.0),
+        )
+
+    def start(self) -> None:
+        """Starts the background thread"""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the background thread after the current refresh"""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def refresh(self) -> int:
+        """Reads the sources once, validates the new candidates and returns the number of proxies added"""
+        now = time.monotonic()
+        self.rejected = {proxy: since for proxy, since in self.rejected.items() if now - since < self.reject_seconds}
+        candidates = [proxy for proxy in fetch_proxies(self.sources, self.source_timeout)
+                      if proxy not in self.pool and proxy not in self.rejected]
+        if not candidates:
+            return 0
+        if self.validation is not None:
+            working = validate_from_settings(candidates, self.validation)
+            for proxy in set(candidates) - {proxy for proxy, _ in working}:
+                self.rejected[proxy] = now
+        else:
+            working = [(proxy, None) for proxy in candidates]
+        added = sum(self.pool.add(proxy, latency) for proxy, latency in working)
+        self.added += added
+        logging.info("Proxy refresh added %s of %s candidates", added, len(candidates))
+        return added
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as error:  # the refresh is retried in the next interval
+                logging.error("Proxy refresh failed: %s", error)
@@ -2,60 +2,192 @@
 return value is a dictionary with the html, the used proxy and the required time. """
 
 import logging
-import random
+import threading
 import time
-from typing import Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import requests
-from exceptions.proxy_exception import ProxyGotBlockedError
-from exceptions.proxy_exception import ProxyListIsEmptyError
-from exceptions.proxy_exception import SlowProxyError
-from exceptions.proxy_exception import ProxyNotWorkingError
+from crawler.exceptions.proxy_exception import ProxyGotBlockedError
+from crawler.exceptions.proxy_exception import SlowProxyError
+from crawler.exceptions.proxy_exception import ProxyNotWorkingError
+from crawler.proxy.block_detection import BlockClassifier
+from crawler.proxy.download import DownloadCancelled, TransferLimits, declared_encoding, read_body
+from crawler.proxy.hedging import HedgeBudget, LatencyTracker
+from crawler.proxy.proxy_pool import ProxyPool
+from crawler.proxy.proxy_sources import default_cache_path, load_proxies, sources_from_settings
+from crawler.proxy.proxy_refresher import ProxyRefresher
+from crawler.proxy.proxy_validation import validate_from_settings
+from crawler.proxy.session_pool import SessionPool
 
 
 class ProxyService:
-    """The Proxy Service has the proxy as Attributes. It`s initialized with a proxy_list and a current_proxy"""
-    proxy_prefix_path = "https://raw.githubusercontent.com/saschazesiger/Free-Proxies/" \
-                        "94732c66982abfc273cfb41056efe7a062b78d01/proxies/"
-    proxy_urls = {
-        "socks4": f"{proxy_prefix_path}socks4.txt",
-        "socks5": f"{proxy_prefix_path}socks5.txt",
-        "http": f"{proxy_prefix_path}http.txt",
-    }
-
-    def __init__(self):
-        self.proxy_list = _get_proxies(self.proxy_urls)
-        self.current_proxy = self.proxy_list.pop()
+    """The Proxy Service has the proxy pool as Attribute. It`s initialized with the proxy settings. If a canary url
+    is configured, only the proxies that pass the validation are used, ranked by their latency. The proxy of
+    every request is chosen by the pool, which prefers fast and healthy proxies. With hedging, slow requests are
+    repeated through a second proxy."""
+
+    def __init__(self, settings: dict = None):
+        settings = settings or {}
+        proxies = _get_proxies(settings)
+        if settings.get("canary_url"):
+            self.pool = ProxyPool.from_settings([], settings)
+            for proxy, latency in validate_from_settings(proxies, settings):
+                self.pool.add(proxy, latency)
+            if not len(self.pool):
+                logging.warning("No proxy passed the validation, using the unvalidated proxies")
+                self.pool = ProxyPool.from_settings(proxies, settings)
+        else:
+            self.pool = ProxyPool.from_settings(proxies, settings)
+        self.current_proxy = None
+        self.sessions = SessionPool.from_settings(settings)
+        self.limits = TransferLimits.from_settings(settings)
+        self.classifier = BlockClassifier.from_settings(settings)
+        self.executor = None
+        self.workers = None
+        self.latencies = None
+        self.hedge_budget = None
+        if settings.get("hedging"):
+            self.executor = ThreadPoolExecutor(max_workers=settings.get("hedge_workers", 4),
+                                               thread_name_prefix="proxy-request")
+            self.workers = threading.BoundedSemaphore(settings.get("hedge_workers", 4))
+            self.latencies = LatencyTracker(percentile=settings.get("hedge_percentile", 95.0),
+                                            default_delay=settings.get("hedge_default_delay", 1.0))
+            self.hedge_budget = HedgeBudget(ratio=settings.get("hedge_budget", 0.1))
+        self.refresher = None
+        if settings.get("refresh_interval"):
+            self.refresher = ProxyRefresher.from_settings(self.pool, settings)
+            self.refresher.start()
+
+    def close(self) -> None:
+        """Stops the background refresh of the proxy pool and the request threads and closes the sessions"""
+        if self.refresher is not None:
+            self.refresher.stop()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        self.sessions.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def get_html(self, url: str, header: dict) -> dict:
-        """Calls the following methods."""
+        """Calls the following methods. The result of every request is reported to the pool. Raises
+        ProxyListIsEmptyError if the pool runs out of proxies."""
         while True:
-            try:
-                return _call_url(url, header, self.current_proxy)
-            except (ProxyGotBlockedError, ProxyNotWorkingError, SlowProxyError) as error:
-                logging.error(error)
-                try:
-                    self.current_proxy = self.proxy_list.pop()
-                except IndexError:
-                    raise ProxyListIsEmptyError
-
-
-def _call_url(url: str, header: dict, current_proxy: str) -> dict:
-    """Makes the request to the given url with the given header and proxy. Also checks if the response is valid."""
-
+            if self.executor is not None:
+                response = self._hedged_attempt(url, header)
+            else:
+                self.current_proxy = self.pool.choose()
+                response = self._attempt(url, header, self.current_proxy)
+            if response is not None:
+                return response
+
+    def _attempt(self, url: str, header: dict, proxy: str, cancel: threading.Event = None,
+                 started: threading.Event = None):
+        """Requests the url through the proxy and reports the result to the pool. Returns the response or None"""
+        if started is not None:
+            started.set()
+        start_time = time.time()
+        try:
+            response = _call_url(url, header, proxy, self.sessions.get(proxy), self.limits, cancel, self.classifier)
+        except DownloadCancelled:
+            self.pool.release_probe(proxy)
+            return None
+        except ProxyGotBlockedError as error:
+            logging.error(error)
+            self.pool.report_blocked(proxy, time.time() - start_time)
+        except SlowProxyError as error:
+            logging.error(error)
+            self.pool.report_slow(proxy, time.time() - start_time)
+        except ProxyNotWorkingError as error:
+            logging.error(error)
+            self.pool.report_error(proxy)
+            self.sessions.discard(proxy)
+        else:
+            self.pool.report_success(proxy, response["time"])
+            if self.latencies is not None:
+                self.latencies.add(response["time"])
+            return response
+        return None
+
+    def _hedged_attempt(self, url: str, header: dict):
+        """Requests the url through a proxy and, if it has not answered after the hedge delay and the budget
+        allows it, through a second proxy. Returns the first valid response or None if all requests failed.
+        Requests that lose the race are cancelled. The hedge delay starts when the first request has a worker, and
+        a hedge is only sent if a worker is free, so cancelled requests that are still running cannot delay it."""
+        self.hedge_budget.record_request()
+        self.current_proxy = self.pool.choose()
+        cancel = threading.Event()
+        started = threading.Event()
+        self.workers.acquire()
+        futures = {self._submit(url, header, self.current_proxy, cancel, started): self.current_proxy}
+        started.wait(self.limits.deadline)
+        delay = self.latencies.delay()
+        hedged = False
+        while futures:
+            done, _ = wait(futures, timeout=None if hedged else delay, return_when=FIRST_COMPLETED)
+            if not done:
+                hedged = True
+                proxy = self.pool.choose_other(futures.values())
+                if proxy is not None and self.workers.acquire(blocking=False):
+                    if self.hedge_budget.try_acquire():
+                        logging.info("Hedging request of %s with proxy %s", url, proxy)
+                        futures[self._submit(url, header, proxy, cancel)] = proxy
+                    else:
+                        self.workers.release()
+                continue
+            for future in done:
+                proxy = futures.pop(future)
+                response = future.result()
+                if response is not None:
+                    self.current_proxy = proxy
+                    cancel.set()
+                    for pending, pending_proxy in futures.items():
+                        if pending.cancel():
+                            self.pool.release_probe(pending_proxy)
+                    return response
+        return None
+
+    def _submit(self, url: str, header: dict, proxy: str, cancel: threading.Event, started: threading.Event = None):
+        """Runs an attempt in the executor. The worker acquired by the caller is released when it has finished"""
+        future = self.executor.submit(self._attempt, url, header, proxy, cancel, started)
+        future.add_done_callback(lambda _: self.workers.release())
+        return future
+
+
+def _call_url(url: str, header: dict, current_proxy: str, session: requests.Session = None,
+              limits: TransferLimits = None, cancel: threading.Event = None,
+              classifier: BlockClassifier = None) -> dict:
+    """Makes the request to the given url with the given header and proxy. Also checks if the response is valid.
+    With a session the connection of the previous request through the proxy is reused. The body is streamed and
+    the download is aborted as soon as it cannot finish within the limits or the classifier detects a block.
+    The html is returned as raw bytes together with the encoding declared in the header (or None)."""
+    limits = limits if limits is not None else TransferLimits()
+    classifier = classifier if classifier is not None else BlockClassifier()
     time_for_request = time.time()
     try:
-        response = requests.get(url, headers=header, proxies={"http": current_proxy}, timeout=3)
+        response = (session or requests).get(url, headers=header,
+                                             proxies={"http": current_proxy, "https": current_proxy},
+                                             timeout=(limits.connect_timeout, limits.read_timeout),
+                                             stream=True)
     except Exception:
         raise ProxyNotWorkingError("Proxy is not working: " + current_proxy)
 
+    with response:
+        classifier.check_head(response.status_code, response.headers, response.url)
+        try:
+            body = read_body(response, time_for_request, limits, cancel, scan=classifier.scan())
+        except (SlowProxyError, ProxyGotBlockedError, DownloadCancelled):
+            raise
+        except Exception:
+            raise ProxyNotWorkingError("Proxy is not working: " + current_proxy)
+
     time_request_finished = time.time() - time_for_request
-    if "(MEOW)" not in response.text:
-        raise ProxyGotBlockedError("Proxy is blocked: " + current_proxy)
-    if time_request_finished > 4.0:
-        raise SlowProxyError("Proxy is too slow: " + current_proxy)
     if response.status_code == 200:
         return {
-            'html': response.text,
+            'html': body,
+            'encoding': declared_encoding(response.headers),
             'proxy': current_proxy,
             'time': time_request_finished,
         }
@@ -63,20 +195,13 @@ def _call_url(url: str, header: dict, current_proxy: str) -> dict:
     raise ProxyNotWorkingError("Proxy is not working: " + current_proxy)
 
 
-def _get_proxies(proxy_urls: dict) -> list:
-    """Creates a list with socks4, socks5 and http proxies"""
+def _get_proxies(settings: dict) -> list:
+    """Creates a list with the proxies of the configured sources (by default socks4, socks5 and http proxies),
+    cached for proxy.cache_ttl seconds"""
     logging.debug("Calling function get_proxies")
-
-    get_proxy_iter: Iterator = lambda protocol: requests.get(proxy_urls[protocol]).iter_lines()
-
-    socks4_proxies = [row.decode() for row in get_proxy_iter("socks4")]
-    socks5_proxies = [row.decode() for row in get_proxy_iter("socks5")]
-    http_proxies = [row.decode() for row in get_proxy_iter("http")]
-
-    socks4_proxies = ["socks4://" + proxy for proxy in socks4_proxies]
-    socks5_proxies = ["socks5h://" + proxy for proxy in socks5_proxies]
-
-    proxy_list = http_proxies + socks4_proxies + socks5_proxies
-    random.shuffle(proxy_list)
-
-    return proxy_list
+    return load_proxies(
+        sources_from_settings(settings),
+        cache_path=settings.get("cache_file") or default_cache_path(),
+        ttl=settings.get("cache_ttl", 3600),
+        timeout=settings.get("source_timeout", 10.0),
+    )
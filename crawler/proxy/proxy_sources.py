@@ -0,0 +1,147 @@
+"""Sources of the proxy list: downloaded or local text files, read concurrently and cached for a ttl."""
+
+import logging
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List
+
+import requests
+
+from crawler.exceptions.proxy_exception import ProxyListIsEmptyError
+
+_PROXY_PREFIX_PATH = "https://raw.githubusercontent.com/saschazesiger/Free-Proxies/" \
+                     "94732c66982abfc273cfb41056efe7a062b78d01/proxies/"
+
+DEFAULT_SOURCES = [
+    {"url": _PROXY_PREFIX_PATH + "http.txt", "protocol": "http"},
+    {"url": _PROXY_PREFIX_PATH + "socks4.txt", "protocol": "socks4"},
+    {"url": _PROXY_PREFIX_PATH + "socks5.txt", "protocol": "socks5h"},
+]
+
+
+def _to_proxy(line: str, protocol: str):
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    if "://" in line or protocol == "http":
+        return line
+    return protocol + "://" + line
+
+
+class UrlSource:
+    """Proxy list that is downloaded from an url."""
+
+    def __init__(self, url: str, protocol: str = "http"):
+        self.url = url
+        self.protocol = protocol
+
+    def __repr__(self) -> str:
+        return "UrlSource(%s)" % self.url
+
+    def fetch(self, timeout: float) -> Iterator[str]:
+        """Yields the proxies while the list is downloaded"""
+        with requests.get(self.url, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=False):
+                proxy = _to_proxy(line.decode("utf-8", "ignore"), self.protocol)
+                if proxy is not None:
+                    yield proxy
+
+
+class FileSource:
+    """Proxy list in a local file."""
+
+    def __init__(self, path: str, protocol: str = "http"):
+        self.path = path
+        self.protocol = protocol
+
+    def __repr__(self) -> str:
+        return "FileSource(%s)" % self.path
+
+    def fetch(self, timeout: float) -> Iterator[str]:
+        """Yields the proxies of the file"""
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                proxy = _to_proxy(line, self.protocol)
+                if proxy is not None:
+                    yield proxy
+
+
+def sources_from_settings(settings: dict) -> list:
+    """Creates the sources given in the proxy settings"""
+    sources = []
+    for source in (settings or {}).get("sources") or DEFAULT_SOURCES:
+        protocol = source.get("protocol", "http")
+        if "file" in source:
+            sources.append(FileSource(source["file"], protocol))
+        else:
+            sources.append(UrlSource(source["url"], protocol))
+    return sources
+
+
+def fetch_proxies(sources: Iterable, timeout: float = 10.0) -> List[str]:
+    """Reads all sources concurrently and returns the proxies without duplicates. Sources that fail are logged and
+    skipped"""
+    sources = list(sources)
+
+    def read(source) -> List[str]:
+        try:
+            return list(source.fetch(timeout))
+        except Exception as error:  # a broken source must not stop the crawl
+            logging.error("Proxy source %s failed: %s", source, error)
+            return []
+
+    with ThreadPoolExecutor(max_workers=max(1, len(sources)), thread_name_prefix="proxy-source") as executor:
+        results = list(executor.map(read, sources))
+    return list(dict.fromkeys(proxy for result in results for proxy in result))
+
+
+def default_cache_path() -> str:
+    """Returns the path of the cache file in the temporary directory (/tmp on AWS Lambda)"""
+    return os.path.join(tempfile.gettempdir(), "proxy_list.txt")
+
+
+def load_proxies(sources: Iterable, cache_path: str = None, ttl: float = 3600.0, timeout: float = 10.0,
+                 rng: random.Random = None) -> List[str]:
+    """Returns the shuffled proxy list from the cache if it is younger than ttl seconds, otherwise from the
+    sources. Raises ProxyListIsEmptyError if neither the sources nor the cache provide proxies"""
+    rng = rng if rng is not None else random.Random()
+    if cache_path is not None and _cache_age(cache_path) < ttl:
+        proxies = _read_cache(cache_path)
+        if proxies:
+            logging.debug("Proxy list read from cache " + cache_path)
+            rng.shuffle(proxies)
+            return proxies
+
+    proxies = fetch_proxies(sources, timeout)
+    if proxies and cache_path is not None:
+        _write_cache(cache_path, proxies)
+    elif not proxies and cache_path is not None and os.path.exists(cache_path):
+        logging.warning("No proxy source available, using the outdated cache " + cache_path)
+        proxies = _read_cache(cache_path)
+    if not proxies:
+        raise ProxyListIsEmptyError
+    rng.shuffle(proxies)
+    return proxies
+
+
+def _cache_age(path: str) -> float:
+    try:
+        return time.time() - os.path.getmtime(path)
+    except OSError:
+        return float("inf")
+
+
+def _read_cache(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def _write_cache(path: str, proxies: List[str]) -> None:
+    temporary = path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        file.write("\n".join(proxies) + "\n")
+    os.replace(temporary, path)
@@ -0,0 +1,53 @@
+"""Concurrent validation of the proxies against a canary url before the crawl."""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+from typing import Iterable, List, Optional, Tuple
+
+import requests
+
+
+def probe_proxy(proxy: str, canary_url: str, timeout: float, expected_text: str = None) -> Optional[float]:
+    """Requests the canary url through the proxy and returns the latency, or None if the proxy does not work"""
+    start_time = time.time()
+    try:
+        response = requests.get(canary_url, proxies={"http": proxy, "https": proxy}, timeout=timeout)
+    except Exception:
+        return None
+    latency = time.time() - start_time
+    if response.status_code != 200 or (expected_text is not None and expected_text not in response.text):
+        return None
+    return latency
+
+
+def validate_proxies(proxies: Iterable[str], canary_url: str, timeout: float = 2.0, workers: int = 64,
+                     deadline: float = 10.0, expected_text: str = None) -> List[Tuple[str, float]]:
+    """Probes the proxies concurrently and returns the working ones with their latency, fastest first"""
+    proxies = list(proxies)
+    working = []
+    executor = ThreadPoolExecutor(max_workers=max(1, min(workers, len(proxies))), thread_name_prefix="proxy-probe")
+    futures = {executor.submit(probe_proxy, proxy, canary_url, timeout, expected_text): proxy for proxy in proxies}
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            latency = future.result()
+            if latency is not None:
+                working.append((futures[future], latency))
+    except FutureTimeoutError:
+        logging.info("Proxy validation stopped after %s seconds", deadline)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    logging.info("%s of %s proxies passed the validation", len(working), len(proxies))
+    return sorted(working, key=lambda item: item[1])
+
+
+def validate_from_settings(proxies: Iterable[str], settings: dict) -> List[Tuple[str, float]]:
+    """Validates the proxies with the canary url, timeout, workers and deadline given in the proxy settings"""
+    return validate_proxies(
+        proxies,
+        settings["canary_url"],
+        timeout=settings.get("validation_timeout", 2.0),
+        workers=settings.get("validation_workers", 64),
+        deadline=settings.get("validation_deadline", 10.0),
+        expected_text=settings.get("canary_text"),
+    )
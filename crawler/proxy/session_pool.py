@@ -0,0 +1,80 @@
+"""Keep-alive sessions per proxy, with bounded connection pools."""
+
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class SessionPool:
+    """requests sessions by proxy, with idle and size based eviction. The methods are thread-safe."""
+
+    def __init__(self, max_sessions: int = 32, pool_maxsize: int = 4, idle_seconds: float = 60.0,
+                 clock=time.monotonic):
+        self.max_sessions = max_sessions
+        self.pool_maxsize = pool_maxsize
+        self.idle_seconds = idle_seconds
+        self.clock = clock
+        self.created = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings: dict) -> "SessionPool":
+        """Creates the session pool with the limits given in the proxy settings"""
+        settings = settings or {}
+        return cls(
+            max_sessions=settings.get("max_sessions", 32),
+            pool_maxsize=settings.get("session_pool_maxsize", 4),
+            idle_seconds=settings.get("session_idle_seconds", 60.0),
+        )
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, proxy: str) -> requests.Session:
+        """Returns the session of the proxy and creates it if needed"""
+        evicted = []
+        with self._lock:
+            now = self.clock()
+            entry = self._sessions.pop(proxy, None)
+            for name, (session, used) in list(self._sessions.items()):
+                if now - used > self.idle_seconds:
+                    del self._sessions[name]
+                    evicted.append(session)
+            if entry is None or now - entry[1] > self.idle_seconds:
+                if entry is not None:
+                    evicted.append(entry[0])
+                entry = (self._new_session(proxy), now)
+                self.created += 1
+            self._sessions[proxy] = (entry[0], now)
+            while len(self._sessions) > self.max_sessions:
+                evicted.append(self._sessions.popitem(last=False)[1][0])
+        for session in evicted:
+            session.close()
+        return entry[0]
+
+    def discard(self, proxy: str) -> None:
+        """Closes the session of the proxy, e.g. after a connection error"""
+        with self._lock:
+            entry = self._sessions.pop(proxy, None)
+        if entry is not None:
+            entry[0].close()
+
+    def close(self) -> None:
+        """Closes all sessions"""
+        with self._lock:
+            sessions = [session for session, _ in self._sessions.values()]
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+    def _new_session(self, proxy: str) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.proxies = {"http": proxy, "https": proxy}
+        return session
@@ -0,0 +1,31 @@
+"""Helpers for the tests of the wrapping sinks: a sink that keeps the records in memory and a test case with a
+temporary directory."""
+import shutil
+import tempfile
+import unittest
+
+from crawler.item_factory.product_record import ProductRecord
+from crawler.persistence.sink import Sink
+
+
+class ListSink(Sink):
+    """Sink that keeps the written records in a list, optionally failing on close"""
+
+    def __init__(self, fail_on_close: bool = False):
+        self.records = []
+        self.fail_on_close = fail_on_close
+
+    def write(self, record: ProductRecord) -> None:
+        self.records.append(record)
+
+    def close(self) -> None:
+        if self.fail_on_close:
+            raise OSError("upload failed")
+
+
+class TempDirTestCase(unittest.TestCase):
+    """Test case with a temporary directory that is removed after every test"""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
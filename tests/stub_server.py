@@ -0,0 +1,85 @@
+"""Local HTTP stub for the proxy tests. It answers every request itself, so it can be used as target url and as
+http proxy (requests sends the absolute url to the proxy) without network access. Tunnels for https urls (CONNECT)
+are recorded and refused."""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PRODUCT_PAGE = "<html><head><title>Amazon.de (MEOW)</title></head><body>Produkt</body></html>"
+
+
+class StubServer:
+    """Serves body with status and headers after delay seconds, in chunks of chunk_size bytes with chunk_delay
+    seconds between them. The attributes can be changed while it runs."""
+
+    def __init__(self, body: str = PRODUCT_PAGE, status: int = 200, delay: float = 0.0, headers: dict = None,
+                 chunk_size: int = None, chunk_delay: float = 0.0):
+        self.body = body.encode("utf-8") if isinstance(body, str) else body
+        self.status = status
+        self.delay = delay
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.sent = 0
+        self.headers = headers or {"Content-Type": "text/html; charset=utf-8"}
+        self.requests = 0
+        self.connections = set()
+        self.tunnels = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Answers every GET request with the configured response"""
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub.requests += 1
+                stub.connections.add(self.client_address)
+                time.sleep(stub.delay)
+                self.send_response(stub.status)
+                for name, value in stub.headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(stub.body)))
+                self.end_headers()
+                chunk_size = stub.chunk_size or len(stub.body)
+                try:
+                    for start in range(0, len(stub.body), chunk_size):
+                        self.wfile.write(stub.body[start:start + chunk_size])
+                        self.wfile.flush()
+                        stub.sent += len(stub.body[start:start + chunk_size])
+                        time.sleep(stub.chunk_delay)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+
+            def do_CONNECT(self):
+                stub.tunnels.append(self.path)
+                self.send_response(502)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """Url of the stub, also usable as http proxy"""
+        return "http://127.0.0.1:%s" % self.server.server_address[1]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def closed_port_url() -> str:
+    """Returns the url of a local port on which nothing listens"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BaseHTTPRequestHandler)
+    port = server.server_address[1]
+    server.server_close()
+    return "http://127.0.0.1:%s" % port
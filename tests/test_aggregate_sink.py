@@ -0,0 +1,59 @@
+"""Class to test the aggregate_sink module."""
+import os
+import unittest
+
+from crawler.item_factory.product_record import ProductRecord
+from crawler.persistence.aggregate_sink import AggregateSink, read_aggregates
+from sink_helpers import ListSink, TempDirTestCase
+
+
+class TestAggregateSink(TempDirTestCase):
+    """Test Class for AggregateSink"""
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.state_path = os.path.join(self.directory, "aggregates.bin")
+        self.record = ProductRecord(timestamp=0.0, asin="B084DWG2VQ", current_price=20.0)
+
+    def _run(self, observations: list, client: str = "linux") -> ListSink:
+        inner = ListSink()
+        with AggregateSink(inner, client, self.state_path, alpha=0.5) as sink:
+            for timestamp, price in observations:
+                sink.write(self.record._replace(timestamp=timestamp, current_price=price))
+        return inner
+
+    def test_aggregates_are_updated_across_runs(self):
+        """The aggregates of several runs equal the aggregates of all observations"""
+        inner = self._run([(0.0, 20.0), (10.0, 20.0), (20.0, 30.0)])
+        self.assertEqual(3, len(inner.records))
+        self._run([(30.0, 10.0), (40.0, 10.0)])
+
+        aggregate = read_aggregates(self.state_path)[("B084DWG2VQ", "linux")]
+        self.assertEqual(5, aggregate.count)
+        self.assertEqual(10.0, aggregate.minimum)
+        self.assertEqual(30.0, aggregate.maximum)
+        self.assertAlmostEqual(18.0, aggregate.mean)
+        self.assertEqual(10.0, aggregate.last_price)
+        self.assertEqual(30.0, aggregate.last_change)
+        self.assertAlmostEqual(13.75, aggregate.ewma)
+
+    def test_clients_and_late_records(self):
+        """Clients are aggregated separately, late records and records without price do not move the last price"""
+        self._run([(0.0, 20.0), (10.0, 25.0)])
+        inner = ListSink()
+        with AggregateSink(inner, "iphone", self.state_path) as sink:
+            sink.write(self.record._replace(timestamp=10.0, current_price=22.0))
+            sink.write(self.record._replace(timestamp=5.0, current_price=18.0))
+            sink.write(self.record._replace(timestamp=20.0, current_price=None))
+            self.assertEqual(25.0, sink.get("B084DWG2VQ", "linux").last_price)
+        self.assertEqual(3, len(inner.records))
+
+        aggregates = read_aggregates(self.state_path)
+        self.assertEqual(2, aggregates[("B084DWG2VQ", "linux")].count)
+        iphone = aggregates[("B084DWG2VQ", "iphone")]
+        self.assertEqual((2, 18.0, 22.0, 22.0, 10.0), (iphone.count, iphone.minimum, iphone.last_price,
+                                                       iphone.ewma, iphone.last_timestamp))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""Class to test the async_sink module."""
+import threading
+import time
+import unittest
+
+from crawler.item_factory.product_record import ProductRecord
+from crawler.persistence.async_sink import AsyncSink
+from crawler.persistence.sink import Sink
+from crawler.persistence.store import create_sink
+
+
+class _SlowSink(Sink):
+    """Sink that records the written batches and takes some time for each write"""
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.batches = []
+        self.closed = False
+        self.threads = set()
+
+    def write(self, record: ProductRecord) -> None:
+        self.write_batch([record])
+
+    def write_batch(self, records) -> None:
+        self.threads.add(threading.current_thread().name)
+        time.sleep(self.delay)
+        if self.fail:
+            raise OSError("disk full")
+        self.batches.append(list(records))
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class TestAsyncSink(unittest.TestCase):
+    """Test Class for AsyncSink"""
+
+    def setUp(self) -> None:
+        self.records = [ProductRecord(timestamp=float(index), asin="B084DWG2VQ") for index in range(50)]
+
+    def test_records_are_written_in_background_and_drained(self):
+        """Writing does not wait for the slow sink, close drains the queue and closes the sink"""
+        inner = _SlowSink(delay=0.05)
+        sink = AsyncSink(inner, queue_size=100, batch_size=10)
+        start = time.monotonic()
+        for record in self.records:
+            sink.write(record)
+        self.assertLess(time.monotonic() - start, 0.05)
+        sink.close()
+
+        self.assertTrue(inner.closed)
+        self.assertEqual({"store-worker"}, inner.threads)
+        self.assertEqual(self.records, [record for batch in inner.batches for record in batch])
+        self.assertTrue(all(len(batch) <= 10 for batch in inner.batches))
+        stats = sink.stats()
+        self.assertEqual(50, stats["written"])
+        self.assertEqual(0, stats["queue_depth"])
+        self.assertGreater(stats["max_queue_depth"], 0)
+        self.assertGreaterEqual(stats["max_write_time"], 0.05)
+
+    def test_error_is_raised_in_crawl_thread(self):
+        """An error of the worker is raised on the next write or on close"""
+        sink = AsyncSink(_SlowSink(fail=True))
+        sink.write(self.records[0])
+        with self.assertRaises(OSError):
+            sink.close()
+
+    def test_create_sink_with_async(self):
+        """storage.async wraps the backend in an AsyncSink"""
+        settings = {"aws_env": False, "client": "linux", "storage": {"async": True}}
+        sink = create_sink(settings)
+        self.assertIsInstance(sink, AsyncSink)
+        sink.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""Class to test the block_detection module and the early block detection of the proxy_service module."""
+import time
+import unittest
+
+from crawler.exceptions.proxy_exception import ProxyGotBlockedError
+from crawler.proxy.block_detection import BlockClassifier
+from crawler.proxy.proxy_service import _call_url
+from stub_server import PRODUCT_PAGE, StubServer
+
+URL = "http://www.amazon.de/dp/B084DWG2VQ"
+CAPTCHA_PAGE = ("<html><head><title dir=\"ltr\">Amazon.de</title></head><body><h4>Geben Sie die angezeigten Zeichen "
+                "im Bild ein</h4><form action=\"/errors/validateCaptcha\"></form>" + "x" * 2_000_000 + "</body></html>")
+
+
+class TestBlockDetection(unittest.TestCase):
+    """Test Class for BlockClassifier and the early abort of blocked downloads"""
+
+    def setUp(self) -> None:
+        self.classifier = BlockClassifier(scan_bytes=64)
+
+    def _scan(self, chunks: list) -> None:
+        scan = self.classifier.scan()
+        for chunk in chunks:
+            scan.feed(chunk)
+        scan.finish()
+
+    def test_head(self):
+        """A block status or a redirect to the captcha form is a block, other responses are not"""
+        with self.assertRaises(ProxyGotBlockedError):
+            self.classifier.check_head(503, {})
+        with self.assertRaises(ProxyGotBlockedError):
+            self.classifier.check_head(200, {}, "https://www.amazon.de/errors/validateCaptcha?amzn=1")
+        self.classifier.check_head(200, {"Content-Type": "text/html"}, URL)
+
+    def test_body(self):
+        """Signatures are found in the first bytes, the marker also across chunk borders"""
+        self._scan([b"<html>(ME", b"OW)", b"x" * 100])
+        with self.assertRaisesRegex(ProxyGotBlockedError, "robot check"):
+            self._scan([b"<title>Robot ", b"Check</title>"])
+        with self.assertRaisesRegex(ProxyGotBlockedError, "marker"):
+            self._scan([b"x" * 100, b"Robot Check"])
+
+    def test_blocked_download_is_cut(self):
+        """The download of a captcha page is aborted after the first chunks"""
+        with StubServer(body=CAPTCHA_PAGE, chunk_size=16384, chunk_delay=0.01) as proxy:
+            with self.assertRaises(ProxyGotBlockedError):
+                _call_url(URL, {}, proxy.url)
+            time.sleep(0.2)
+            self.assertLess(proxy.sent, len(CAPTCHA_PAGE) / 4)
+        with StubServer(status=503) as proxy:
+            with self.assertRaises(ProxyGotBlockedError):
+                _call_url(URL, {}, proxy.url)
+        with StubServer(body=PRODUCT_PAGE) as proxy:
+            self.assertEqual(PRODUCT_PAGE.encode("utf-8"), _call_url(URL, {}, proxy.url)["html"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+"""Class to test the columnar_history module."""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from crawler.analytics.columnar_history import ColumnarHistory, write_history
+
+
+class TestColumnarHistory(unittest.TestCase):
+    """Test Class for write_history and ColumnarHistory"""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.frame = pd.DataFrame({
+            "timestamp": pd.to_datetime([30.0, 10.0, 20.0, 10.0, 5.0], unit="s", utc=True),
+            "asin": pd.Categorical(["B1", "B1", "B2", "B1", "B1"]),
+            "client": pd.Categorical(["linux", "linux", "linux", "iphone", "linux"]),
+            "current_price": [3.0, 1.0, 7.0, 1.5, np.nan],
+            "price_regular": [5.0, 5.0, np.nan, 5.0, 5.0],
+        })
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_series_are_sorted_views(self):
+        """The series of a product is returned sorted by time as view of the mapped column"""
+        self.assertEqual(5, write_history(self.frame, self.directory.name))
+        history = ColumnarHistory(self.directory.name)
+
+        timestamps, prices = history.series("B1", "linux")
+        self.assertEqual([5.0, 10.0, 30.0], list(timestamps))
+        self.assertTrue(np.isnan(prices[0]))
+        self.assertEqual([1.0, 3.0], list(prices[1:]))
+        self.assertIsInstance(prices.base, np.memmap)
+        self.assertFalse(prices.flags.writeable)
+        self.assertEqual([5.0], list(history.column("price_regular", "B1", "iphone")))
+        self.assertEqual({("B1", "iphone"), ("B1", "linux"), ("B2", "linux")}, set(history.keys()))
+
+    def test_unknown_and_empty(self):
+        """Unknown products and an empty history return empty arrays"""
+        write_history(self.frame.iloc[:0], self.directory.name)
+        history = ColumnarHistory(self.directory.name)
+        self.assertNotIn(("B1", "linux"), history)
+        self.assertEqual(0, len(history.series("B1", "linux")[1]))
+
+    def test_rewrite_keeps_open_history(self):
+        """A rewrite creates a new generation, an open history keeps its data and old generations are removed"""
+        write_history(self.frame, self.directory.name)
+        history = ColumnarHistory(self.directory.name)
+        write_history(self.frame.assign(current_price=self.frame["current_price"] * 2), self.directory.name)
+        write_history(self.frame.assign(current_price=self.frame["current_price"] * 3), self.directory.name)
+
+        self.assertEqual([1.0, 3.0], list(history.series("B1", "linux")[1][1:]))
+        latest = ColumnarHistory(self.directory.name)
+        self.assertEqual(3, latest.generation)
+        self.assertEqual([3.0, 9.0], list(latest.series("B1", "linux")[1][1:]))
+        self.assertEqual(["current_price-2.f8", "current_price-3.f8", "index.json", "price_regular-2.f8",
+                          "price_regular-3.f8", "timestamp-2.f8", "timestamp-3.f8"],
+                         sorted(os.listdir(self.directory.name)))
+
+
+if __name__ == '__main__':
+    unittest.main()
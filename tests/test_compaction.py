@@ -0,0 +1,135 @@
+"""Class to test the compaction module on a local directory and against the moto S3 stand-in."""
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+import boto3
+from moto import mock_aws
+
+from crawler.exceptions.store_exception import CompactionError
+from crawler.item_factory.product_record import ProductRecord
+from crawler.persistence.compaction import (LocalObjectStore, S3ObjectStore, compact_partition, list_data_files,
+                                            main, read_records)
+from crawler.persistence.s3_sink import S3Sink
+from crawler.persistence.store import PartitionedFileSink
+
+
+def _record(asin: str, hour: int, price: float) -> ProductRecord:
+    return ProductRecord(timestamp=datetime(2022, 5, 9, hour, 0, 0).timestamp(), name="Echo Dot",
+                         current_price=price, asin=asin, url="https://www.amazon.de/dp/" + asin)
+
+
+def _read_all(store, keys: list) -> list:
+    records = []
+    for key in keys:
+        records += list(read_records(store, key))
+    return records
+
+
+class TestLocalCompaction(unittest.TestCase):
+    """Test Class for the compaction of a local output directory"""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = LocalObjectStore(self.directory.name)
+        self._write_run("run1", [_record("B2", 1, 2.0), _record("B1", 1, 1.0)])
+        self._write_run("run2", [_record("B1", 2, 1.5), _record("B2", 2, 2.5)], file_format="parquet")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def _write_run(self, run_id: str, records: list, file_format: str = "csv") -> None:
+        with PartitionedFileSink(self.directory.name, "linux", run_id=run_id, file_format=file_format) as sink:
+            sink.write_batch(records)
+
+    def test_runs_are_merged_into_sorted_file(self):
+        """The csv and parquet runs are merged into one parquet file sorted by asin and timestamp"""
+        manifest = compact_partition(self.store, "products", "linux", "2022-05-09")
+
+        self.assertEqual(4, manifest["rows"])
+        self.assertEqual(["run1", "run2"], manifest["compacted_runs"])
+        self.assertEqual(1, len(manifest["files"]))
+        records = _read_all(self.store, list_data_files(self.store, "products", "linux", "2022-05-09"))
+        self.assertEqual([("B1", 1.0), ("B1", 1.5), ("B2", 2.0), ("B2", 2.5)],
+                         [(record.asin, record.current_price) for record in records])
+
+    def test_new_runs_are_visible_once(self):
+        """Runs written after the compaction are listed next to the compacted file and merged by the next
+        compaction"""
+        compact_partition(self.store, "products", "linux", "2022-05-09")
+        self._write_run("run3", [_record("B3", 3, 3.0)])
+        keys = list_data_files(self.store, "products", "linux", "2022-05-09")
+        self.assertEqual(5, len(_read_all(self.store, keys)))
+        self.assertIsNone(compact_partition(self.store, "products", "linux", "2022-05-10"))
+
+        manifest = compact_partition(self.store, "products", "linux", "2022-05-09", delete_sources=True)
+        self.assertEqual(5, manifest["rows"])
+        self.assertEqual(["run1", "run2", "run3"], manifest["compacted_runs"])
+        keys = self.store.list("products/client=linux/date=2022-05-09/")
+        self.assertEqual(["products/client=linux/date=2022-05-09/_manifest.json"] + [file["key"] for file in
+                                                                                  manifest["files"]], keys)
+
+    def test_files_are_split_at_target_size(self):
+        """The output is split into several files once a file reaches the target size"""
+        self._write_run("run3", [_record("B%03d" % number, 3, float(number)) for number in range(300)])
+        manifest = compact_partition(self.store, "products", "linux", "2022-05-09", target_bytes=100,
+                                     row_group_rows=100)
+
+        self.assertEqual(4, len(manifest["files"]))
+        self.assertEqual(304, sum(file["rows"] for file in manifest["files"]))
+        asins = [record.asin for record in _read_all(self.store, [file["key"] for file in manifest["files"]])]
+        self.assertEqual(sorted(asins), asins)
+
+    def test_row_count_mismatch_keeps_manifest(self):
+        """A source file whose row count differs from its manifest aborts the compaction before the swap"""
+        path = os.path.join(self.directory.name, "products/client=linux/date=2022-05-09/run=run1/_manifest.json")
+        with open(path, "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+        manifest["files"][0]["rows"] = 3
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(manifest, file)
+
+        with self.assertRaises(CompactionError):
+            compact_partition(self.store, "products", "linux", "2022-05-09")
+        self.assertIsNone(self.store.read("products/client=linux/date=2022-05-09/_manifest.json"))
+
+    def test_command_line(self):
+        """The command line compacts all dates of the client before today"""
+        main(["--directory", self.directory.name, "--client", "linux"])
+        self.assertIsNotNone(self.store.read("products/client=linux/date=2022-05-09/_manifest.json"))
+
+
+class TestS3Compaction(unittest.TestCase):
+    """Test Class for the compaction of an S3 bucket"""
+
+    def setUp(self) -> None:
+        os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+        self.mock = mock_aws()
+        self.mock.start()
+        self.s3_client = boto3.client("s3")
+        self.s3_client.create_bucket(Bucket="testbucket")
+
+    def tearDown(self) -> None:
+        self.mock.stop()
+
+    def test_compaction_with_deleted_sources(self):
+        """The runs of the bucket are merged and removed after the manifest has been replaced"""
+        for run_id, hour in (("run1", 1), ("run2", 2)):
+            with S3Sink("testbucket", "linux", run_id=run_id, s3_client=self.s3_client) as sink:
+                sink.write_batch([_record("B2", hour, 2.0), _record("B1", hour, 1.0)])
+        store = S3ObjectStore("testbucket", self.s3_client)
+
+        manifest = compact_partition(store, "products", "linux", "2022-05-09", delete_sources=True)
+
+        self.assertEqual(4, manifest["rows"])
+        keys = store.list("products/")
+        self.assertEqual(2, len(keys))
+        self.assertEqual(["B1", "B1", "B2", "B2"],
+                         [record.asin for record in _read_all(store, list_data_files(store, "products", "linux",
+                                                                                     "2022-05-09"))])
+
+
+if __name__ == '__main__':
+    unittest.main()
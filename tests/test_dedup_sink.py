@@ -0,0 +1,79 @@
+"""Class to test the dedup_sink module."""
+import os
+import unittest
+
+from crawler.item_factory.product_record import ProductRecord
+from crawler.persistence.dedup_sink import DedupSink, FileKeySet
+from sink_helpers import ListSink, TempDirTestCase
+
+
+class TestDedupSink(TempDirTestCase):
+    """Test Class for DedupSink"""
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.key_file = os.path.join(self.directory, "keys.bin")
+        self.record = ProductRecord(timestamp=7200.0, asin="B084DWG2VQ", current_price=29.18)
+
+    def test_duplicates_in_bucket_are_dropped(self):
+        """Only the first record per asin and time bucket is written, records without asin are always written"""
+        inner = ListSink()
+        with DedupSink(inner, "linux", bucket_seconds=3600) as sink:
+            sink.write(self.record)
+            sink.write(self.record._replace(timestamp=7300.0))
+            sink.write(self.record._replace(timestamp=10800.0))
+            sink.write(self.record._replace(asin="B07SF1LZ9Q"))
+            sink.write(self.record._replace(asin=None))
+            sink.write(self.record._replace(asin=None))
+        self.assertEqual([7200.0, 10800.0, 7200.0, 7200.0, 7200.0], [record.timestamp for record in inner.records])
+        self.assertEqual(1, sink.dropped)
+
+    def test_keys_survive_the_run(self):
+        """A retry of a successful run is dropped completely, a retry of a failed run is written again"""
+        with self.assertRaises(OSError):
+            with DedupSink(ListSink(fail_on_close=True), "linux", key_set=FileKeySet(self.key_file)) as sink:
+                sink.write(self.record)
+
+        inner = ListSink()
+        with DedupSink(inner, "linux", key_set=FileKeySet(self.key_file)) as sink:
+            sink.write(self.record)
+        self.assertEqual([self.record], inner.records)
+        self.assertEqual(16, os.path.getsize(self.key_file))
+
+        inner = ListSink()
+        with DedupSink(inner, "linux", key_set=FileKeySet(self.key_file)) as sink:
+            sink.write(self.record)
+        self.assertEqual([], inner.records)
+
+        inner = ListSink()
+        with DedupSink(inner, "iphone", key_set=FileKeySet(self.key_file)) as sink:
+            sink.write(self.record)
+        self.assertEqual([self.record], inner.records)
+
+    def test_keys_are_committed_on_flush(self):
+        """The keys of flushed records are kept even if the run crashes before the sink is closed"""
+        inner = ListSink()
+        sink = DedupSink(inner, "linux", key_set=FileKeySet(self.key_file))
+        sink.write(self.record)
+        sink.flush()
+        self.assertEqual([self.record], inner.records)
+
+        inner = ListSink()
+        with DedupSink(inner, "linux", key_set=FileKeySet(self.key_file)) as sink:
+            sink.write(self.record)
+        self.assertEqual([], inner.records)
+
+    def test_expired_keys_are_removed(self):
+        """Keys of buckets older than the retention are removed from the key file"""
+        key_set = FileKeySet(self.key_file)
+        key_set.add(1, 11)
+        key_set.add(5, 55)
+        key_set.commit()
+
+        key_set = FileKeySet(self.key_file, retention_buckets=2, current_bucket=6)
+        self.assertEqual({55}, key_set.keys)
+        self.assertEqual(16, os.path.getsize(self.key_file))
+
+
+if __name__ == '__main__':
+    unittest.main()
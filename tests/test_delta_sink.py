@@ -0,0 +1,48 @@
+"""Class to test the delta_sink module."""
+import os
+import unittest
+
+from crawler.item_factory.product_record import ProductRecord
+from crawler.persistence.delta_sink import DeltaSink, rebuild_series
+from sink_helpers import ListSink, TempDirTestCase
+
+
+class TestDeltaSink(TempDirTestCase):
+    """Test Class for DeltaSink and rebuild_series"""
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.state_path = os.path.join(self.directory, "state.json")
+        self.record = ProductRecord(timestamp=0.0, asin="B084DWG2VQ", current_price=29.18, seller="Amazon")
+
+    def _run(self, prices: list, start: float) -> list:
+        inner = ListSink()
+        with DeltaSink(inner, "linux", self.state_path, heartbeat_seconds=10000) as sink:
+            for index, price in enumerate(prices):
+                sink.write(self.record._replace(timestamp=start + index * 3600, current_price=price))
+        return inner.records
+
+    def test_only_changes_and_heartbeats_are_written(self):
+        """Unchanged observations are skipped across runs, changes and heartbeats are written"""
+        written = self._run([29.18, 29.18, 30.0], 0.0)
+        self.assertEqual([0.0, 7200.0], [record.timestamp for record in written])
+
+        written = self._run([30.0, 30.0, 30.0, 30.0], 10800.0)
+        self.assertEqual([18000.0], [record.timestamp for record in written])
+
+        inner = ListSink()
+        with DeltaSink(inner, "iphone", self.state_path) as sink:
+            sink.write(self.record)
+        self.assertEqual([self.record], inner.records)
+
+    def test_rebuild_series(self):
+        """The full time series is rebuilt from the deltas, limited by the heartbeat"""
+        deltas = self._run([29.18, 29.18, 30.0], 0.0)
+        series = rebuild_series(deltas, [-1.0, 0.0, 3600.0, 7200.0, 10800.0, 20000.0], heartbeat_seconds=10000)
+        prices = [record.current_price if record else None for record in series["B084DWG2VQ"]]
+        self.assertEqual([None, 29.18, 29.18, 30.0, 30.0, None], prices)
+        self.assertEqual(3600.0, series["B084DWG2VQ"][2].timestamp)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""Class to test the download module and the streamed requests of the proxy_service module with local stubs."""
+import gzip
+import os
+import threading
+import time
+import unittest
+
+from crawler.exceptions.proxy_exception import ProxyNotWorkingError, SlowProxyError
+from crawler.proxy.download import DownloadCancelled, TransferLimits
+from crawler.proxy.proxy_service import _call_url
+from stub_server import PRODUCT_PAGE, StubServer
+
+URL = "http://www.amazon.de/dp/B084DWG2VQ"
+LARGE_PAGE = PRODUCT_PAGE + "x" * 400_000
+
+
+class TestDownload(unittest.TestCase):
+    """Test Class for the streamed download with deadline and minimum transfer rate"""
+
+    def test_fast_transfer(self):
+        """A fast transfer returns the whole page"""
+        with StubServer(body=LARGE_PAGE, chunk_size=50_000) as proxy:
+            response = _call_url(URL, {}, proxy.url, limits=TransferLimits(deadline=2.0))
+        self.assertEqual(LARGE_PAGE.encode("utf-8"), response["html"])
+        self.assertEqual("utf-8", response["encoding"])
+
+    def test_transfer_that_cannot_finish_is_aborted_early(self):
+        """A transfer that would need longer than the deadline is aborted after the grace time"""
+        with StubServer(body=LARGE_PAGE, chunk_size=10_000, chunk_delay=0.05) as proxy:
+            start_time = time.time()
+            with self.assertRaises(SlowProxyError):
+                _call_url(URL, {}, proxy.url, limits=TransferLimits(deadline=1.5, min_rate=1000, grace_seconds=0.3))
+            self.assertLess(time.time() - start_time, 1.0)
+            time.sleep(0.2)
+            self.assertLess(proxy.sent, len(LARGE_PAGE) / 2)
+
+    def test_minimum_rate_and_deadline(self):
+        """A transfer below the minimum rate is aborted, as is a transfer past the deadline"""
+        with StubServer(body=LARGE_PAGE, chunk_size=10_000, chunk_delay=0.05) as proxy:
+            with self.assertRaises(SlowProxyError):
+                _call_url(URL, {}, proxy.url, limits=TransferLimits(deadline=10.0, min_rate=500_000,
+                                                                    grace_seconds=0.2))
+            with self.assertRaisesRegex(SlowProxyError, "deadline of 0.3"):
+                _call_url(URL, {}, proxy.url, limits=TransferLimits(deadline=0.3, min_rate=0, grace_seconds=10.0))
+
+    def test_deadline_of_trickling_transfer(self):
+        """A transfer that trickles in small pieces is aborted at the deadline, not after a full chunk"""
+        with StubServer(body=LARGE_PAGE, chunk_size=100, chunk_delay=0.05) as proxy:
+            start_time = time.time()
+            with self.assertRaisesRegex(SlowProxyError, "deadline of 1.0"):
+                _call_url(URL, {}, proxy.url, limits=TransferLimits(deadline=1.0, min_rate=0, grace_seconds=10.0))
+            self.assertLess(time.time() - start_time, 1.3)
+
+    def test_deadline_of_stalled_transfer(self):
+        """A read that waits for data is interrupted at the deadline, headers that do not arrive within the
+        deadline fail the request"""
+        with StubServer(body=LARGE_PAGE, chunk_size=20_000, chunk_delay=0.8) as proxy:
+            start_time = time.time()
+            with self.assertRaisesRegex(SlowProxyError, "deadline of 2.0"):
+                _call_url(URL, {}, proxy.url, limits=TransferLimits(deadline=2.0, min_rate=0, grace_seconds=10.0,
+                                                                    chunk_size=100_000))
+            self.assertLess(time.time() - start_time, 2.3)
+        with StubServer(delay=5.0) as proxy:
+            start_time = time.time()
+            with self.assertRaises(ProxyNotWorkingError):
+                _call_url(URL, {}, proxy.url, limits=TransferLimits(deadline=1.0))
+            self.assertLess(time.time() - start_time, 1.3)
+
+    def test_rate_of_compressed_body(self):
+        """The rate of a compressed body is measured on the wire, not on the decoded bytes"""
+        page = (PRODUCT_PAGE + os.urandom(150_000).hex()).encode("utf-8")
+        body = gzip.compress(page)
+        headers = {"Content-Type": "text/html; charset=utf-8", "Content-Encoding": "gzip"}
+        with StubServer(body=body, headers=headers, chunk_size=5000, chunk_delay=0.05) as proxy:
+            with self.assertRaisesRegex(SlowProxyError, "rate"):
+                _call_url(URL, {}, proxy.url, limits=TransferLimits(deadline=10.0, min_rate=150_000,
+                                                                    grace_seconds=0.3))
+        with StubServer(body=body, headers=headers, chunk_size=50_000) as proxy:
+            self.assertEqual(page, _call_url(URL, {}, proxy.url, limits=TransferLimits(deadline=2.0))["html"])
+
+    def test_cancel(self):
+        """A download is stopped when the cancel event is set"""
+        cancel = threading.Event()
+        cancel.set()
+        with StubServer(body=LARGE_PAGE, chunk_size=10_000) as proxy:
+            with self.assertRaises(DownloadCancelled):
+                _call_url(URL, {}, proxy.url, cancel=cancel)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""Class to test the hedging module and the hedged requests of the proxy_service module with local stubs."""
+import time
+import unittest
+from unittest import mock
+
+from crawler.proxy.hedging import HedgeBudget, LatencyTracker
+from crawler.proxy.proxy_service import ProxyService
+from stub_server import PRODUCT_PAGE, StubServer
+
+URL = "http://www.amazon.de/dp/B084DWG2VQ"
+
+
+class TestHedging(unittest.TestCase):
+    """Test Class for LatencyTracker, HedgeBudget and hedged requests"""
+
+    def test_latency_percentile(self):
+        """The delay is the default until enough latencies are known, then their percentile"""
+        tracker = LatencyTracker(percentile=90, default_delay=2.0, min_samples=5)
+        self.assertEqual(2.0, tracker.delay())
+        for latency in range(1, 11):
+            tracker.add(latency / 10)
+        self.assertEqual(1.0, tracker.delay())
+
+    def test_budget(self):
+        """A hedge costs one token, every request earns ratio tokens up to the burst"""
+        budget = HedgeBudget(ratio=0.5, burst=1.0)
+        self.assertTrue(budget.try_acquire())
+        self.assertFalse(budget.try_acquire())
+        budget.record_request()
+        budget.record_request()
+        budget.record_request()
+        self.assertTrue(budget.try_acquire())
+        self.assertEqual(2, budget.hedges)
+
+    def _service(self, proxies: list, settings: dict) -> ProxyService:
+        with mock.patch("crawler.proxy.proxy_service._get_proxies", return_value=proxies):
+            return ProxyService(dict({"hedging": True, "hedge_default_delay": 0.1}, **settings))
+
+    def test_slow_proxy_is_hedged(self):
+        """The response of the fast proxy is used without waiting for the slow one"""
+        with StubServer(delay=1.5) as slow, StubServer() as fast:
+            service = self._service([slow.url, fast.url], {})
+            service.pool.stats[slow.url].latency = 0.01
+            start_time = time.time()
+            response = service.get_html(URL, {})
+            duration = time.time() - start_time
+            service.close()
+        self.assertEqual(fast.url, response["proxy"])
+        self.assertLess(duration, 1.0)
+        self.assertEqual(1, service.hedge_budget.hedges)
+
+    def test_cancelled_probe_is_released(self):
+        """A half-open probe that loses against the hedge is probed again later instead of staying half-open"""
+        with StubServer(body=PRODUCT_PAGE + "x" * 20_000, chunk_size=1000, chunk_delay=0.2) as slow, \
+                StubServer() as fast:
+            service = self._service([slow.url, fast.url], {})
+            for _ in range(3):
+                service.pool.report_error(slow.url)
+            service.pool.stats[slow.url].quarantined_until = 0.0
+            response = service.get_html(URL, {})
+            for _ in range(50):
+                if not service.pool.stats[slow.url].probing:
+                    break
+                time.sleep(0.05)
+            service.close()
+        self.assertEqual(fast.url, response["proxy"])
+        self.assertEqual("open", service.pool.stats[slow.url].state)
+        self.assertEqual([slow.url], service.pool.quarantined())
+
+    def test_budget_limits_hedges(self):
+        """Without budget the slow proxy is waited for"""
+        with StubServer(delay=0.3) as slow, StubServer() as fast:
+            service = self._service([slow.url, fast.url], {"hedge_budget": 0.0})
+            service.hedge_budget.tokens = 0.0
+            service.pool.stats[slow.url].latency = 0.01
+            response = service.get_html(URL, {})
+            service.close()
+        self.assertEqual(slow.url, response["proxy"])
+        self.assertEqual(0, fast.requests)
+
+    def test_hedge_needs_a_free_worker(self):
+        """No hedge is sent while all workers are busy, so it does not queue behind the running requests"""
+        with StubServer(delay=0.5) as slow, StubServer() as fast:
+            service = self._service([slow.url, fast.url], {"hedge_workers": 1})
+            service.pool.stats[slow.url].latency = 0.01
+            response = service.get_html(URL, {})
+            service.close()
+        self.assertEqual(slow.url, response["proxy"])
+        self.assertEqual(0, fast.requests)
+        self.assertEqual(0, service.hedge_budget.hedges)
+
+
+if __name__ == '__main__':
+    unittest.main()
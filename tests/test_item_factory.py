@@ -61,7 +61,7 @@ class TestItemFactory(unittest.TestCase):
             'country_of_origin': None,
             'product_dimensions': '100 x 100 x 89 mm',
             'number_of_reviews': 165656,
-            'review_score': '4,6',
+            'review_score': 4.6,
             'on_sale_since': None,
             'url': 'https://www.amazon.de/der-neue-echo-dot-4-generation-smarter-lautsprecher-mit-alexa-'
                    'anthrazit/dp/B084DWG2VQ',
@@ -95,7 +95,7 @@ class TestItemFactory(unittest.TestCase):
             'country_of_origin': 'Deutschland',
             'product_dimensions': '17.8 x 7.3 x 17.7 cm; 0.48 Gramm',
             'number_of_reviews': 56549,
-            'review_score': '4,6',
+            'review_score': 4.6,
             'on_sale_since': None,
             'url': 'https://www.amazon.de/Xbox-Wireless-Controller-Electric-Volt/dp/B091CK241X',
             'timestamp': None,
@@ -129,7 +129,7 @@ class TestItemFactory(unittest.TestCase):
             'country_of_origin': None,
             'product_dimensions': '28 x 20 x 27.5 cm; 4.68 Kilogramm',
             'number_of_reviews': 701,
-            'review_score': '4,5',
+            'review_score': 4.5,
             'on_sale_since': '31.3.2021',
             'url': 'https://www.amazon.de/FLAMMBURO-Paraffinbasis-Grillanz%C3%BCnder-Kaminanz%C3%BCnder-'
                    'Paraffinw%C3%BCrfel/dp/B08YCWDLTQ',
@@ -163,7 +163,7 @@ class TestItemFactory(unittest.TestCase):
             'country_of_origin': 'Deutschland',
             'product_dimensions': '1.9 x 17.2 x 13.6 cm; 140 Gramm',
             'number_of_reviews': 1763,
-            'review_score': '4,1',
+            'review_score': 4.1,
             'on_sale_since': None,
             'url': 'https://www.amazon.de/CYBERPUNK-2077-DAY-Standard-Xbox/dp/B07SF1LZ9Q',
             'timestamp': None,
@@ -171,3 +171,23 @@ class TestItemFactory(unittest.TestCase):
             'time': None,
         }
         self.assertDictEqual(expected, product, "The created product does not match the expected output.")
+
+    def test_create_item_from_bytes(self):
+        """Parsing the raw bytes of a page gives the same item as parsing the decoded text"""
+        for number in range(1, 5):
+            html = self.test_html['test_html_%s' % number]
+            url = self.urls['url%s' % number]
+            expected = item_factory.create_item(html, url)
+            product = item_factory.create_item(html.encode('utf8'), url, 'utf-8')
+            for attribute in ('timestamp', 'date', 'time'):
+                del expected[attribute], product[attribute]
+            self.assertDictEqual(expected, product, "The item of the bytes does not match the item of the text.")
+
+    def test_encoding_sniffing(self):
+        """The encoding is taken from the header, else from the meta tag, else utf-8"""
+        html = '<html><head><meta http-equiv="Content-Type" content="text/html; charset=ISO-8859-1"></head>' \
+               '<body><span id="productTitle">Grüße</span></body></html>'
+        self.assertEqual('Grüße', item_factory.create_item(html.encode('latin-1'), self.urls['url1'])['name'])
+        self.assertEqual('ISO-8859-1', item_factory._sniff_encoding(html.encode('latin-1'), None))
+        self.assertEqual('cp1252', item_factory._sniff_encoding(html.encode('latin-1'), 'cp1252'))
+        self.assertEqual('utf-8', item_factory._sniff_encoding(b'<html></html>', 'unknown'))
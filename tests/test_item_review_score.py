@@ -36,21 +36,21 @@ class TestItemFactory(unittest.TestCase):
         """Tests the create item function of the item_factory module"""
 
         product = item_factory.create_item(self.test_html['test_html_1'], self.urls['url1'])
-        expected = '4,6'
+        expected = 4.6
         self.assertEqual(expected, product["review_score"],
                          "The created item review_score does not match the expected output.")
 
         product = item_factory.create_item(self.test_html['test_html_2'], self.urls['url2'])
-        expected = '4,6'
+        expected = 4.6
         self.assertEqual(expected, product["review_score"],
                          "The created item review_score does not match the expected output.")
 
         product = item_factory.create_item(self.test_html['test_html_3'], self.urls['url3'])
-        expected = '4,5'
+        expected = 4.5
         self.assertEqual(expected, product["review_score"],
                          "The created item review_score does not match the expected output.")
 
         product = item_factory.create_item(self.test_html['test_html_4'], self.urls['url4'])
-        expected = '4,1'
+        expected = 4.1
         self.assertEqual(expected, product["review_score"],
                          "The created item review_score does not match the expected output.")
@@ -0,0 +1,53 @@
+"""Class to test the latest_store module, with a local file and the moto DynamoDB stand-in."""
+import os
+import unittest
+
+from moto import mock_aws
+
+from crawler.item_factory.product_record import ProductRecord
+from crawler.persistence.latest_store import (DynamoSnapshotStore, FileSnapshotStore, LatestSnapshotSink,
+                                              create_snapshot_table, latest_prices)
+from sink_helpers import ListSink, TempDirTestCase
+
+
+class TestLatestStore(TempDirTestCase):
+    """Test Class for LatestSnapshotSink and the snapshot stores"""
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.record = ProductRecord(timestamp=100.0, asin="B084DWG2VQ", current_price=29.18, prime=True,
+                                    number_of_reviews=165656, review_score=4.6, name="Echo Dot")
+
+    def _check_store(self, open_store):
+        history = ListSink()
+        with LatestSnapshotSink(history, open_store(), "linux", batch_size=2) as sink:
+            sink.write(self.record)
+            sink.write(self.record._replace(timestamp=200.0, current_price=30.0))
+            sink.write(self.record._replace(asin="B07SF1LZ9Q", current_price=59.99))
+        with LatestSnapshotSink(ListSink(), open_store(), "iphone") as sink:
+            sink.write(self.record._replace(current_price=35.0))
+        with LatestSnapshotSink(ListSink(), open_store(), "linux") as sink:
+            sink.write(self.record._replace(timestamp=150.0, current_price=1.0))
+
+        self.assertEqual(3, len(history.records))
+        store = open_store()
+        self.assertEqual(self.record._replace(timestamp=200.0, current_price=30.0), store.get("B084DWG2VQ", "linux"))
+        self.assertIsNone(store.get("B084DWG2VQ", "android"))
+        self.assertEqual({("B084DWG2VQ", "linux"): 30.0, ("B084DWG2VQ", "iphone"): 35.0,
+                          ("B07SF1LZ9Q", "linux"): 59.99},
+                         latest_prices(store, ["B084DWG2VQ", "B07SF1LZ9Q"], ["linux", "iphone", "android"]))
+        store.close()
+
+    def test_file_snapshot_store(self):
+        """The local file keeps the newest record per asin and client"""
+        self._check_store(lambda: FileSnapshotStore(os.path.join(self.directory, "latest")))
+
+    @mock_aws
+    def test_dynamo_snapshot_store(self):
+        """The DynamoDB table keeps the newest record per asin and client, an older record does not replace it"""
+        os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+        create_snapshot_table("latest_products")
+        self._check_store(lambda: DynamoSnapshotStore("latest_products"))
+
+if __name__ == '__main__':
+    unittest.main()
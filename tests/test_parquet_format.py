@@ -0,0 +1,96 @@
+"""Class to test the parquet output of the persistence module, local and in the moto S3 stand-in."""
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+import boto3
+import pyarrow as pa
+import pyarrow.parquet as pq
+from moto import mock_aws
+
+from crawler.item_factory.product_record import ProductRecord
+from crawler.persistence.parquet_format import read_parquet_records
+from crawler.persistence.s3_sink import S3Sink
+from crawler.persistence.store import PartitionedFileSink, create_sink
+
+
+class TestParquetFormat(unittest.TestCase):
+    """Test Class for the parquet format"""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        start = datetime(2022, 5, 9, 10, 0, 0).timestamp()
+        self.records = [
+            ProductRecord(timestamp=start + index,
+                          name="Echo Dot",
+                          current_price=29.18 + index,
+                          prime=True,
+                          seller="Amazon",
+                          brand="Amazon",
+                          asin="B084DWG2VQ",
+                          number_of_reviews=165656,
+                          review_score=4.6,
+                          url="https://www.amazon.de/dp/B084DWG2VQ")
+            for index in range(5)
+        ]
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory)
+
+    def test_local_parquet_file(self):
+        """Records are written as typed, dictionary encoded columns in row groups and can be read back"""
+        with PartitionedFileSink(self.directory, "linux", run_id="run1", file_format="parquet",
+                                 writer_options={"row_group_rows": 2}) as sink:
+            sink.write_batch(self.records)
+
+        path = os.path.join(self.directory, "products/client=linux/date=2022-05-09/run=run1/part-00000.parquet")
+        self.assertTrue(os.path.exists(os.path.join(os.path.dirname(path), "_manifest.json")))
+        parquet_file = pq.ParquetFile(path)
+        self.assertEqual(3, parquet_file.num_row_groups)
+        self.assertEqual(pa.timestamp("us", tz="UTC"), parquet_file.schema_arrow.field("timestamp").type)
+        self.assertEqual(pa.float64(), parquet_file.schema_arrow.field("current_price").type)
+        seller_column = parquet_file.metadata.row_group(0).column(8)
+        self.assertEqual("seller", seller_column.path_in_schema)
+        self.assertTrue(seller_column.has_dictionary_page)
+
+        self.assertEqual(self.records, list(read_parquet_records(path)))
+
+    def test_values_of_another_type(self):
+        """A value that does not have the type of its column is written as null instead of failing the file"""
+        record = self.records[0]._replace(amazon_choice_for=False, number_of_reviews=3.0)
+        with PartitionedFileSink(self.directory, "linux", run_id="run4", file_format="parquet") as sink:
+            sink.write(record)
+
+        path = os.path.join(self.directory, "products/client=linux/date=2022-05-09/run=run4/part-00000.parquet")
+        self.assertEqual([record._replace(amazon_choice_for=None, number_of_reviews=3)],
+                         list(read_parquet_records(path)))
+
+    def test_create_sink_with_parquet_format(self):
+        """The storage format of the settings selects the partitioned parquet sink for local runs"""
+        settings = {"aws_env": False, "client": "linux",
+                    "storage": {"format": "parquet", "output_directory": self.directory}}
+        sink = create_sink(settings, run_id="run2")
+        self.assertIsInstance(sink, PartitionedFileSink)
+        self.assertEqual("part-00000.parquet", sink.file_name)
+        sink.close()
+
+    @mock_aws
+    def test_s3_parquet_object(self):
+        """The S3 sink uploads a parquet object when the parquet format is chosen"""
+        os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+        s3_client = boto3.client("s3")
+        s3_client.create_bucket(Bucket="testbucket")
+        with S3Sink("testbucket", "android", run_id="run3", s3_client=s3_client, file_format="parquet") as sink:
+            sink.write_batch(self.records)
+
+        body = s3_client.get_object(
+            Bucket="testbucket", Key="products/client=android/date=2022-05-09/run=run3/part-00000.parquet"
+        )["Body"].read()
+        self.assertEqual(self.records, list(read_parquet_records(io.BytesIO(body))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""Class to test the price_analytics module with small outputs written by the stores."""
+import math
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+from crawler.analytics.price_analytics import (device_price_deltas, discount_frequency, load_csv, load_partitions,
+                                               price_series, rolling_statistics)
+from crawler.item_factory.product_record import ProductRecord
+from crawler.persistence.rolling_sink import RollingCsvSink, segments_in_range
+from crawler.persistence.store import PartitionedFileSink, store_to_csv
+
+
+def _record(asin: str, day: int, hour: int, price: float, regular: float = None) -> ProductRecord:
+    return ProductRecord(timestamp=datetime(2022, 5, day, hour, 10, 0, tzinfo=timezone.utc).timestamp(),
+                         name="Echo Dot", current_price=price, price_regular=regular, asin=asin,
+                         url="https://www.amazon.de/dp/" + asin)
+
+
+class TestPriceAnalytics(unittest.TestCase):
+    """Test Class for the price analyses"""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        runs = {
+            "linux": [_record("B1", 9, 10, 10.0), _record("B1", 9, 11, 12.0, 15.0), _record("B2", 9, 10, 5.0),
+                      _record("B1", 10, 10, 14.0)],
+            "iphone": [_record("B1", 9, 10, 11.0), _record("B1", 9, 11, 12.5, 15.0), _record("B2", 9, 10, 5.0)],
+        }
+        for client, records in runs.items():
+            with PartitionedFileSink(self.directory.name, client, run_id="run1",
+                                     file_format="parquet" if client == "iphone" else "csv") as sink:
+                sink.write_batch(records)
+        self.frame = load_partitions(self.directory.name)
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_load_partitions(self):
+        """csv and parquet partitions of all clients and dates are loaded into one frame"""
+        self.assertEqual(7, len(self.frame))
+        self.assertEqual({"linux", "iphone"}, set(self.frame["client"]))
+        self.assertEqual("category", str(self.frame["asin"].dtype))
+
+    def test_load_csv(self):
+        """The client of a csv output file is taken from its name"""
+        path = os.path.join(self.directory.name, "android.csv")
+        store_to_csv(_record("B1", 9, 10, 9.0), path)
+        frame = load_csv(path)
+        self.assertEqual(["android"], list(frame["client"]))
+        self.assertEqual(9.0, frame["current_price"][0])
+
+    def test_load_csv_segment(self):
+        """The client of a rolling csv segment is taken from the part of its name before the date"""
+        with RollingCsvSink(self.directory.name, "fire-tv") as sink:
+            sink.write(_record("B1", 9, 10, 9.0))
+            sink.write(_record("B1", 10, 10, 8.0))
+        path = segments_in_range(self.directory.name, "fire-tv")[0]
+        self.assertTrue(path.endswith("fire-tv-2022-05-09-000.csv.gz"))
+        frame = load_csv(path)
+        self.assertEqual(["fire-tv"], list(frame["client"]))
+        self.assertEqual(9.0, frame["current_price"][0])
+
+    def test_price_series(self):
+        """The price series of an asin is sorted by client and time"""
+        series = price_series(self.frame, asin="B1", client="linux")
+        self.assertEqual([10.0, 12.0, 14.0], list(series["current_price"]))
+
+    def test_device_price_deltas(self):
+        """The deltas are the prices of the other clients minus the base client per hour"""
+        deltas = device_price_deltas(self.frame, base_client="linux")
+        self.assertEqual(["iphone"], list(deltas.columns))
+        self.assertEqual([1.0, 0.5], list(deltas.loc["B1"]["iphone"][:2]))
+        self.assertEqual(0.0, deltas.loc["B2"]["iphone"].iloc[0])
+        self.assertTrue(math.isnan(deltas.loc["B1"]["iphone"].iloc[2]))
+
+    def test_discount_frequency(self):
+        """An observation below the regular price counts as discounted"""
+        frequency = discount_frequency(self.frame)
+        self.assertEqual(3, frequency.loc[("B1", "linux"), "observations"])
+        self.assertEqual(1, frequency.loc[("B1", "linux"), "discounted"])
+        self.assertEqual(0.0, frequency.loc[("B2", "iphone"), "frequency"])
+
+    def test_rolling_statistics(self):
+        """The rolling window only contains the prices within the window"""
+        statistics = rolling_statistics(self.frame, window="1D")
+        linux = statistics.loc[("B1", "linux")]
+        self.assertEqual([10.0, 11.0, 13.0], list(linux["mean"]))
+        self.assertEqual([10.0, 12.0, 14.0], list(linux["max"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+"""Class to test the product_record module."""
+import math
+import unittest
+from datetime import datetime
+from crawler.item_factory.product_record import ProductBatch, ProductRecord
+
+
+class TestProductRecord(unittest.TestCase):
+    """Test Class for ProductRecord and ProductBatch"""
+
+    def setUp(self) -> None:
+        self.record = ProductRecord(timestamp=datetime(2022, 5, 9, 20, 6, 56).timestamp(),
+                                    name="Echo Dot",
+                                    current_price=29.18,
+                                    price_regular=59.99,
+                                    asin="B084DWG2VQ",
+                                    number_of_reviews=165656,
+                                    review_score=4.6)
+
+    def test_derived_date_and_time(self):
+        """Date and time are derived from the timestamp and appear in the dictionary form"""
+        self.assertEqual("2022-05-09", self.record.date)
+        self.assertEqual("20:06:56", self.record.time)
+        product = self.record.to_dict()
+        self.assertEqual(24, len(product))
+        self.assertEqual("20:06:56", product["time"])
+        self.assertEqual(self.record, ProductRecord.from_dict(product))
+
+    def test_typed_values(self):
+        """Values are converted to the declared field types, values of another type are dropped"""
+        record = ProductRecord.typed(timestamp=1, amazon_choice_for=False, number_of_reviews=3.0, shipping=0,
+                                     current_price=True, amazon_choice=False)
+        self.assertIsNone(record.amazon_choice_for)
+        self.assertIsNone(record.current_price)
+        self.assertIs(False, record.amazon_choice)
+        self.assertEqual((3, int), (record.number_of_reviews, type(record.number_of_reviews)))
+        self.assertEqual((0.0, float), (record.shipping, type(record.shipping)))
+        self.assertEqual(1.0, record.timestamp)
+
+    def test_batch_round_trip(self):
+        """Records added to a batch come back unchanged, float columns are stored in typed arrays"""
+        other = self.record._replace(current_price=None, asin="B07SF1LZ9Q")
+        batch = ProductBatch([self.record, other])
+
+        self.assertEqual(2, len(batch))
+        self.assertEqual([self.record, other], list(batch))
+        self.assertEqual("d", batch.raw_column("current_price").typecode)
+        self.assertTrue(math.isnan(batch.raw_column("current_price")[1]))
+        self.assertEqual([29.18, None], batch.column("current_price"))
+        self.assertEqual(["B084DWG2VQ", "B07SF1LZ9Q"], batch.column("asin"))
+
+        batch.clear()
+        self.assertEqual(0, len(batch))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+"""Class to test the proxy_pool module and the proxy selection of the proxy_service module with a local stub."""
+import random
+import unittest
+from unittest import mock
+
+from crawler.exceptions.proxy_exception import ProxyListIsEmptyError
+from crawler.proxy.proxy_pool import ProxyPool
+from crawler.proxy.proxy_service import ProxyService
+from stub_server import StubServer, closed_port_url
+
+
+class TestProxyPool(unittest.TestCase):
+    """Test Class for ProxyPool"""
+
+    def setUp(self) -> None:
+        self.pool = ProxyPool(["fast", "slow", "blocked"], rng=random.Random(1), max_failures=3)
+        for _ in range(10):
+            self.pool.report_success("fast", 0.2)
+            self.pool.report_success("slow", 2.5)
+        self.pool.report_blocked("blocked", 0.2)
+
+    def test_statistics(self):
+        """The moving averages follow the reported requests"""
+        self.assertLess(self.pool.stats["fast"].latency, 0.3)
+        self.assertEqual(1.0, self.pool.stats["fast"].success_rate)
+        self.assertAlmostEqual(0.2, self.pool.stats["blocked"].block_rate)
+        self.assertAlmostEqual(0.8, self.pool.stats["blocked"].success_rate)
+        self.assertGreater(self.pool.stats["fast"].score, self.pool.stats["slow"].score)
+
+    def test_power_of_two_choices_prefers_fast_proxy(self):
+        """The fast proxy wins every comparison it takes part in, the weakest proxy is never chosen"""
+        choices = [self.pool.choose() for _ in range(300)]
+        self.assertGreater(choices.count("fast"), 150)
+        self.assertEqual(0, choices.count("slow"))
+
+    def test_weighted_policy(self):
+        """The weighted policy chooses proportional to the score"""
+        pool = ProxyPool(["fast", "slow"], policy="weighted", rng=random.Random(1))
+        pool.report_success("fast", 0.1)
+        pool.report_success("slow", 5.0)
+        choices = [pool.choose() for _ in range(300)]
+        self.assertGreater(choices.count("fast"), choices.count("slow"))
+        self.assertGreater(choices.count("slow"), 0)
+
+    def test_failing_proxy_is_quarantined(self):
+        """A proxy is quarantined after max_failures failures in a row, missed deadlines count as failures"""
+        self.pool.report_slow("slow", 5.0)
+        self.pool.report_slow("slow", 5.0)
+        self.assertEqual("closed", self.pool.stats["slow"].state)
+        self.assertEqual(1.0, self.pool.stats["slow"].success_rate)
+        self.pool.report_error("blocked")
+        self.assertEqual("closed", self.pool.stats["blocked"].state)
+        self.pool.report_error("blocked")
+        self.assertEqual(["blocked"], self.pool.quarantined())
+        self.assertEqual(["fast", "slow"], self.pool.proxies())
+        self.pool.report_slow("slow", 5.0)
+        self.assertEqual(["blocked", "slow"], self.pool.quarantined())
+
+        self.pool.remove("fast")
+        self.pool.remove("slow")
+        self.pool.remove("blocked")
+        with self.assertRaises(ProxyListIsEmptyError):
+            self.pool.choose()
+
+
+class TestProxyQuarantine(unittest.TestCase):
+    """Test Class for the circuit breakers of ProxyPool"""
+
+    def setUp(self) -> None:
+        self.now = 0.0
+        self.sleeps = []
+        self.pool = ProxyPool(["a", "b"], max_failures=1, quarantine_seconds=10.0, max_quarantine_seconds=25.0,
+                              max_wait_seconds=100.0, rng=random.Random(1), clock=lambda: self.now,
+                              sleep=self._sleep)
+
+    def _sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def test_backoff_and_half_open_probe(self):
+        """The quarantine doubles with every failed probe, a successful probe lets the proxy rejoin"""
+        self.pool.report_error("a")
+        self.assertEqual("open", self.pool.stats["a"].state)
+        self.assertEqual(["b"] * 5, [self.pool.choose() for _ in range(5)])
+
+        self.now = 10.0
+        self.assertEqual("a", self.pool.choose())
+        self.assertEqual("half-open", self.pool.stats["a"].state)
+        self.assertEqual("b", self.pool.choose())
+        self.pool.report_blocked("a", 0.5)
+        self.assertEqual(30.0, self.pool.stats["a"].quarantined_until)
+
+        self.now = 30.0
+        self.assertEqual("a", self.pool.choose())
+        self.pool.report_error("a")
+        self.assertEqual(55.0, self.pool.stats["a"].quarantined_until)
+
+        self.now = 55.0
+        self.assertEqual("a", self.pool.choose())
+        self.pool.report_slow("a", 4.0)
+        self.assertEqual("open", self.pool.stats["a"].state)
+        self.assertEqual(80.0, self.pool.stats["a"].quarantined_until)
+
+        self.now = 80.0
+        self.assertEqual("a", self.pool.choose())
+        self.pool.report_success("a", 0.5)
+        self.assertEqual("closed", self.pool.stats["a"].state)
+        self.assertEqual(0, self.pool.stats["a"].quarantines)
+        self.assertEqual(["a", "b"], sorted(self.pool.proxies()))
+
+    def test_released_probe_is_probed_again(self):
+        """A probe whose request was cancelled is handed out again instead of staying half-open"""
+        self.pool.report_error("a")
+        self.now = 10.0
+        self.assertEqual("a", self.pool.choose())
+        self.pool.release_probe("a")
+        self.assertEqual("open", self.pool.stats["a"].state)
+        self.assertEqual(1, self.pool.stats["a"].quarantines)
+        self.assertEqual("a", self.pool.choose())
+        self.assertEqual("half-open", self.pool.stats["a"].state)
+
+    def test_wait_for_probe_when_all_quarantined(self):
+        """If every proxy is quarantined choose waits for the next probe or gives up after max_wait_seconds"""
+        self.pool.report_error("a")
+        self.now = 4.0
+        self.pool.report_error("b")
+        self.assertEqual("a", self.pool.choose())
+        self.assertEqual([6.0], self.sleeps)
+
+        self.pool.max_wait_seconds = 1.0
+        with self.assertRaises(ProxyListIsEmptyError):
+            self.pool.choose()
+
+
+class TestProxyServiceSelection(unittest.TestCase):
+    """Test Class for the proxy selection of ProxyService"""
+
+    def test_dead_proxy_is_avoided(self):
+        """The requests succeed with the working proxy and the dead proxy is quarantined"""
+        with StubServer() as proxy:
+            dead = closed_port_url()
+            with mock.patch("crawler.proxy.proxy_service._get_proxies", return_value=[dead, proxy.url]):
+                service = ProxyService({"max_failures": 1})
+            service.pool.stats[dead].latency = 0.001
+            for _ in range(5):
+                response = service.get_html("http://www.amazon.de/dp/B084DWG2VQ", {})
+                self.assertEqual(proxy.url, response["proxy"])
+            self.assertEqual([dead], service.pool.quarantined())
+            self.assertEqual(5, service.pool.stats[proxy.url].requests)
+
+
+if __name__ == '__main__':
+    unittest.main()
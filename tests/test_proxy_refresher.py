@@ -0,0 +1,77 @@
+"""Class to test the proxy_refresher module with local stubs as proxies."""
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from crawler.proxy.proxy_pool import ProxyPool
+from crawler.proxy.proxy_refresher import ProxyRefresher
+from crawler.proxy.proxy_service import ProxyService
+from crawler.proxy.proxy_sources import FileSource
+from stub_server import StubServer, closed_port_url
+
+
+class TestProxyRefresher(unittest.TestCase):
+    """Test Class for ProxyRefresher"""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "proxies.txt")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def _write_sources(self, proxies: list) -> None:
+        with open(self.path, "w", encoding="utf-8") as file:
+            file.write("\n".join(proxies) + "\n")
+
+    def test_refresh_adds_only_new_working_proxies(self):
+        """Known proxies are skipped, dead candidates are rejected and not validated again"""
+        with StubServer() as known, StubServer() as new:
+            dead = closed_port_url()
+            pool = ProxyPool([known.url])
+            self._write_sources([known.url, new.url, dead])
+            refresher = ProxyRefresher(pool, [FileSource(self.path)],
+                                       validation={"canary_url": "http://canary.test/", "validation_timeout": 0.5})
+
+            self.assertEqual(1, refresher.refresh())
+            self.assertEqual(0, known.requests)
+            self.assertEqual(1, new.requests)
+            self.assertEqual([known.url, new.url], pool.proxies())
+            self.assertIn(dead, refresher.rejected)
+            self.assertEqual(0, refresher.refresh())
+            self.assertEqual(1, new.requests)
+
+    def test_waiting_crawl_gets_refreshed_proxy(self):
+        """A crawl waiting for a proxy because all are quarantined continues with the proxy added in the background"""
+        pool = ProxyPool(["broken"], max_failures=1, quarantine_seconds=60.0, max_wait_seconds=10.0)
+        pool.report_error("broken")
+        self._write_sources(["fresh:8080"])
+        refresher = ProxyRefresher(pool, [FileSource(self.path)], interval=0.2)
+        chosen = []
+        waiting = threading.Thread(target=lambda: chosen.append(pool.choose()))
+        start_time = time.time()
+        waiting.start()
+        refresher.start()
+        waiting.join(5.0)
+        refresher.stop()
+
+        self.assertEqual(["fresh:8080"], chosen)
+        self.assertLess(time.time() - start_time, 2.0)
+
+    def test_service_stops_refresher_on_error(self):
+        """The refresher of a ProxyService used as context manager is stopped even if the crawl fails"""
+        self._write_sources(["fresh:8080"])
+        settings = {"refresh_interval": 60, "sources": [{"file": self.path}]}
+        with mock.patch("crawler.proxy.proxy_service._get_proxies", return_value=["known:8080"]):
+            with self.assertRaises(RuntimeError):
+                with ProxyService(settings) as service:
+                    self.assertTrue(service.refresher._thread.is_alive())
+                    raise RuntimeError("crawl failed")
+        self.assertFalse(service.refresher._thread.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+"""Class to test the proxy_sources module with local files and stub servers."""
+import os
+import random
+import tempfile
+import time
+import unittest
+
+from crawler.exceptions.proxy_exception import ProxyListIsEmptyError
+from crawler.proxy.proxy_sources import FileSource, UrlSource, load_proxies, sources_from_settings
+from stub_server import StubServer, closed_port_url
+
+
+class TestProxySources(unittest.TestCase):
+    """Test Class for the proxy sources and the cached proxy list"""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.directory.name, "proxy_list.txt")
+        self.file_path = os.path.join(self.directory.name, "proxies.txt")
+        with open(self.file_path, "w", encoding="utf-8") as file:
+            file.write("# local proxies\n10.0.0.1:1080\n\n10.0.0.2:1080\nsocks4://10.0.0.3:1080\n")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_sources_are_merged_without_duplicates(self):
+        """Url and file sources are read, the protocol is added and duplicates are removed"""
+        with StubServer(body="10.0.0.1:1080\r\n10.0.0.9:8080\r\n", headers={"Content-Type": "text/plain"}) as stub:
+            sources = sources_from_settings({"sources": [{"url": stub.url + "/socks5.txt", "protocol": "socks5h"},
+                                                         {"file": self.file_path, "protocol": "socks5h"},
+                                                         {"url": stub.url + "/http.txt"}]})
+            proxies = load_proxies(sources, self.cache_path, rng=random.Random(1))
+
+        self.assertIsInstance(sources[1], FileSource)
+        self.assertEqual(sorted(["socks5h://10.0.0.1:1080", "socks5h://10.0.0.9:8080", "socks5h://10.0.0.2:1080",
+                                 "socks4://10.0.0.3:1080", "10.0.0.1:1080", "10.0.0.9:8080"]), sorted(proxies))
+        self.assertTrue(os.path.exists(self.cache_path))
+
+    def test_cache_and_failing_sources(self):
+        """A fresh cache is used without reading the sources, an outdated one only if all sources fail"""
+        load_proxies([FileSource(self.file_path)], self.cache_path)
+        broken = [UrlSource(closed_port_url() + "/http.txt"), FileSource(self.file_path + ".missing")]
+        self.assertEqual(3, len(load_proxies(broken, self.cache_path, ttl=60)))
+
+        old = time.time() - 120
+        os.utime(self.cache_path, (old, old))
+        self.assertEqual(3, len(load_proxies(broken, self.cache_path, ttl=60, timeout=1.0)))
+        self.assertEqual(3, len(load_proxies(broken + [FileSource(self.file_path)], self.cache_path, ttl=60)))
+
+        os.remove(self.cache_path)
+        with self.assertRaises(ProxyListIsEmptyError):
+            load_proxies(broken, self.cache_path, timeout=1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
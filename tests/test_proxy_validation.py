@@ -0,0 +1,53 @@
+"""Class to test the proxy_validation module with local stubs as proxies."""
+import time
+import unittest
+from unittest import mock
+
+from crawler.proxy.proxy_service import ProxyService
+from crawler.proxy.proxy_validation import validate_proxies
+from stub_server import StubServer, closed_port_url
+
+CANARY_URL = "http://canary.test/robots.txt"
+
+
+class TestProxyValidation(unittest.TestCase):
+    """Test Class for validate_proxies"""
+
+    def test_only_working_proxies_are_ranked(self):
+        """Dead, slow, failing and wrong proxies are dropped, the working ones are ranked by latency"""
+        with StubServer(body="User-agent: *") as fast, StubServer(body="User-agent: *", delay=0.1) as slower, \
+                StubServer(delay=1.0) as slow, StubServer(status=503) as failing, StubServer(body="Captcha") as wrong:
+            proxies = [slow.url, slower.url, closed_port_url(), failing.url, wrong.url, fast.url]
+            ranked = validate_proxies(proxies, CANARY_URL, timeout=0.5, workers=10, expected_text="User-agent")
+
+        self.assertEqual([fast.url, slower.url], [proxy for proxy, _ in ranked])
+        self.assertLess(ranked[0][1], ranked[1][1])
+
+    def test_deadline(self):
+        """The validation returns after the deadline, even if many probes are still running"""
+        with StubServer(delay=2.0) as slow, StubServer() as fast:
+            start_time = time.time()
+            ranked = validate_proxies([fast.url] + [slow.url] * 50, CANARY_URL, timeout=3.0, workers=51,
+                                      deadline=0.5)
+            self.assertLess(time.time() - start_time, 1.5)
+        self.assertEqual([fast.url], [proxy for proxy, _ in ranked])
+
+    def test_https_canary_goes_through_the_proxy(self):
+        """An https canary url is requested through a tunnel of the proxy, not directly"""
+        with StubServer() as proxy:
+            ranked = validate_proxies([proxy.url], "https://canary.test/robots.txt", timeout=0.5)
+        self.assertEqual([], ranked)
+        self.assertEqual(["canary.test:443"], proxy.tunnels)
+
+    def test_service_starts_with_validated_pool(self):
+        """ProxyService only puts the validated proxies into its pool, with the measured latency"""
+        with StubServer() as proxy:
+            dead = closed_port_url()
+            with mock.patch("crawler.proxy.proxy_service._get_proxies", return_value=[dead, proxy.url]):
+                service = ProxyService({"canary_url": CANARY_URL, "validation_timeout": 0.5})
+        self.assertEqual([proxy.url], service.pool.proxies())
+        self.assertLess(service.pool.stats[proxy.url].latency, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
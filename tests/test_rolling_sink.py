@@ -0,0 +1,61 @@
+"""Class to test the rolling_sink module."""
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from crawler.item_factory.product_record import ProductRecord
+from crawler.persistence.rolling_sink import RollingCsvSink, open_segment, segments_in_range
+
+
+class TestRollingSink(unittest.TestCase):
+    """Test Class for RollingCsvSink"""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.day_one = datetime(2022, 5, 9, 10, 0, 0).timestamp()
+        self.day_two = datetime(2022, 5, 10, 10, 0, 0).timestamp()
+        self.record = ProductRecord(timestamp=self.day_one, name="Echo Dot", current_price=29.18,
+                                    asin="B084DWG2VQ", url="https://www.amazon.de/dp/B084DWG2VQ")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory)
+
+    def _rows(self, path: str) -> list:
+        with open_segment(path) as file:
+            return list(csv.reader(file))
+
+    def test_daily_rotation_across_runs(self):
+        """The active segment is continued by the next run and compressed when a record of a new day arrives"""
+        with RollingCsvSink(self.directory, "linux") as sink:
+            sink.write(self.record)
+        with RollingCsvSink(self.directory, "linux") as sink:
+            sink.write(self.record._replace(timestamp=self.day_one + 60))
+            sink.write(self.record._replace(timestamp=self.day_two))
+
+        paths = segments_in_range(self.directory, "linux")
+        self.assertEqual(["linux-2022-05-09-000.csv.gz", "linux-2022-05-10-000.csv"],
+                         [os.path.basename(path) for path in paths])
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "linux-2022-05-09-000.csv")))
+        self.assertEqual(3, len(self._rows(paths[0])))
+        self.assertEqual(2, len(self._rows(paths[1])))
+
+        self.assertEqual([paths[1]], segments_in_range(self.directory, "linux", start=self.day_one + 61))
+        self.assertEqual([paths[0]], segments_in_range(self.directory, "linux", end=self.day_one + 60))
+
+    def test_size_rotation_with_zstd(self):
+        """Segments are rotated when they exceed max_bytes and compressed with zstd"""
+        with RollingCsvSink(self.directory, "iphone", max_bytes=300, compression="zstd", flush_rows=1) as sink:
+            for minute in range(4):
+                sink.write(self.record._replace(timestamp=self.day_one + minute * 60))
+
+        paths = segments_in_range(self.directory, "iphone")
+        self.assertEqual(["iphone-2022-05-09-000.csv.zst", "iphone-2022-05-09-001.csv.zst"],
+                         [os.path.basename(path) for path in paths])
+        self.assertEqual(["timestamp", str(self.day_one)], [row[0] for row in self._rows(paths[0])][:2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""Class to test the s3_sink module against the moto S3 stand-in."""
+import csv
+import io
+import json
+import os
+import unittest
+from datetime import datetime
+
+import boto3
+from moto import mock_aws
+
+from crawler.item_factory.product_record import ProductRecord
+from crawler.persistence.partitioning import parse_partition
+from crawler.persistence.s3_sink import S3Sink
+
+
+class TestS3Sink(unittest.TestCase):
+    """Test Class for S3Sink"""
+
+    def setUp(self) -> None:
+        os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+        self.mock = mock_aws()
+        self.mock.start()
+        self.s3_client = boto3.client("s3")
+        self.s3_client.create_bucket(Bucket="testbucket")
+        self.record = ProductRecord(timestamp=datetime(2022, 5, 9, 20, 6, 56).timestamp(),
+                                    name="Echo Dot, Anthrazit",
+                                    current_price=29.18,
+                                    asin="B084DWG2VQ",
+                                    url="https://www.amazon.de/dp/B084DWG2VQ")
+
+    def tearDown(self) -> None:
+        self.mock.stop()
+
+    def _read_rows(self, key: str) -> list:
+        body = self.s3_client.get_object(Bucket="testbucket", Key=key)["Body"].read().decode("utf-8")
+        return list(csv.reader(io.StringIO(body)))
+
+    def _keys(self) -> list:
+        return [obj["Key"] for obj in self.s3_client.list_objects_v2(Bucket="testbucket").get("Contents", [])]
+
+    def test_run_is_uploaded_as_one_object(self):
+        """All records of a run end up in one object, which is only created on close"""
+        sink = S3Sink("testbucket", "linux", run_id="run1", s3_client=self.s3_client)
+        for _ in range(3):
+            sink.write(self.record)
+        self.assertEqual([], self._keys())
+        sink.close()
+
+        self.assertEqual(["products/client=linux/date=2022-05-09/run=run1/_manifest.json",
+                          "products/client=linux/date=2022-05-09/run=run1/part-00000.csv"], self._keys())
+        rows = self._read_rows("products/client=linux/date=2022-05-09/run=run1/part-00000.csv")
+        self.assertEqual(4, len(rows))
+        self.assertEqual("timestamp", rows[0][0])
+        self.assertEqual("Echo Dot Anthrazit", rows[1][3])
+        self.assertEqual("B084DWG2VQ", rows[3][12])
+
+    def test_spill_and_multipart_upload(self):
+        """A run larger than the spill size is moved to disk and uploaded in several parts"""
+        record = self.record._replace(name="x" * 100_000)
+        with S3Sink("testbucket", "linux", run_id="run1", prefix="", s3_client=self.s3_client, spill_size=1024,
+                    multipart_threshold=5 * 1024 * 1024) as sink:
+            for _ in range(60):
+                sink.write(record)
+            self.assertTrue(sink.partitions["2022-05-09"].file._rolled)
+
+        key = "client=linux/date=2022-05-09/run=run1/part-00000.csv"
+        head = self.s3_client.head_object(Bucket="testbucket", Key=key)
+        self.assertIn("-", head["ETag"])
+        self.assertEqual(61, len(self._read_rows(key)))
+
+    def test_partition_per_date_with_manifest(self):
+        """Records of a run that spans midnight are split into one partition per date, each with a manifest"""
+        late = self.record._replace(timestamp=datetime(2022, 5, 9, 23, 59, 0).timestamp())
+        early = self.record._replace(timestamp=datetime(2022, 5, 10, 0, 1, 0).timestamp())
+        with S3Sink("testbucket", "iphone", run_id="run2", s3_client=self.s3_client) as sink:
+            sink.write_batch([self.record, late, early])
+
+        manifest_keys = [key for key in self._keys() if key.endswith("_manifest.json")]
+        self.assertEqual(2, len(manifest_keys))
+        self.assertEqual({"client": "iphone", "date": "2022-05-10", "run": "run2"},
+                         parse_partition(manifest_keys[1]))
+
+        body = self.s3_client.get_object(Bucket="testbucket", Key=manifest_keys[0])["Body"].read()
+        manifest = json.loads(body)
+        self.assertEqual(2, manifest["rows"])
+        self.assertEqual(self.record.timestamp, manifest["min_timestamp"])
+        self.assertEqual(late.timestamp, manifest["max_timestamp"])
+        self.assertEqual(3, len(self._read_rows(manifest["files"][0]["key"])))
+
+    def test_empty_run_uploads_nothing(self):
+        """A run without records does not create an object"""
+        S3Sink("testbucket", "linux", s3_client=self.s3_client).close()
+        self.assertEqual([], self._keys())
+
+
+if __name__ == '__main__':
+    unittest.main()
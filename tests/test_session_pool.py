@@ -0,0 +1,65 @@
+"""Class to test the session_pool module with local stubs as proxies."""
+import unittest
+from unittest import mock
+
+from crawler.exceptions.proxy_exception import ProxyNotWorkingError
+from crawler.proxy.proxy_service import ProxyService, _call_url
+from crawler.proxy.session_pool import SessionPool
+from stub_server import StubServer
+
+
+class TestSessionPool(unittest.TestCase):
+    """Test Class for SessionPool"""
+
+    def setUp(self) -> None:
+        self.now = 0.0
+        self.sessions = SessionPool(max_sessions=2, idle_seconds=10.0, clock=lambda: self.now)
+
+    def tearDown(self) -> None:
+        self.sessions.close()
+
+    def test_session_is_reused_per_proxy(self):
+        """The same proxy gets the same session, different proxies get different sessions"""
+        first = self.sessions.get("a")
+        self.assertIs(first, self.sessions.get("a"))
+        self.assertIsNot(first, self.sessions.get("b"))
+        self.assertEqual({"http": "a", "https": "a"}, first.proxies)
+
+    def test_eviction(self):
+        """Idle sessions and the least recently used session above max_sessions are closed"""
+        first = self.sessions.get("a")
+        self.sessions.get("b")
+        self.now = 5.0
+        self.sessions.get("a")
+        self.sessions.get("c")
+        self.assertEqual(2, len(self.sessions))
+        self.assertIs(first, self.sessions.get("a"))
+
+        self.now = 20.0
+        self.assertIsNot(first, self.sessions.get("a"))
+        self.assertEqual(1, len(self.sessions))
+        self.sessions.discard("a")
+        self.assertEqual(0, len(self.sessions))
+
+    def test_https_goes_through_the_proxy(self):
+        """An https url is requested through a tunnel of the proxy, with and without session"""
+        with StubServer() as proxy:
+            for session in (None, self.sessions.get(proxy.url)):
+                with self.assertRaises(ProxyNotWorkingError):
+                    _call_url("https://www.amazon.de/dp/B084DWG2VQ", {}, proxy.url, session)
+        self.assertEqual(["www.amazon.de:443"] * 2, proxy.tunnels)
+
+    def test_connection_is_kept_alive(self):
+        """Consecutive requests of ProxyService through one proxy use one connection"""
+        with StubServer() as proxy:
+            with mock.patch("crawler.proxy.proxy_service._get_proxies", return_value=[proxy.url]):
+                service = ProxyService()
+            for _ in range(5):
+                service.get_html("http://www.amazon.de/dp/B084DWG2VQ", {"Connection": "keep-alive"})
+            service.close()
+        self.assertEqual(5, proxy.requests)
+        self.assertEqual(1, len(proxy.connections))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+"""Class to test the sqlite_store module."""
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from crawler.item_factory.product_record import ProductRecord
+from crawler.persistence.sqlite_store import PriceHistory, SqliteSink
+from crawler.persistence.store import create_sink
+
+
+class TestSqliteStore(unittest.TestCase):
+    """Test Class for SqliteSink and PriceHistory"""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "history.db")
+        self.start = datetime(2022, 5, 9, 10, 0, 0).timestamp()
+        self.record = ProductRecord(timestamp=self.start, name="Echo Dot", current_price=29.18, prime=True,
+                                    sold_by_amazon=False, asin="B084DWG2VQ", number_of_reviews=165656,
+                                    review_score=4.6)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory)
+
+    def test_price_series_and_latest(self):
+        """Stored records can be queried as price series and as latest values per client"""
+        with SqliteSink(self.path, "linux", batch_size=2) as sink:
+            for day in range(3):
+                sink.write(self.record._replace(timestamp=self.start + day * 86400, current_price=30.0 + day))
+        with SqliteSink(self.path, "iphone") as sink:
+            sink.write(self.record._replace(current_price=35.0))
+
+        history = PriceHistory(self.path)
+        self.assertEqual("wal", history.connection.execute("PRAGMA journal_mode").fetchone()[0])
+        self.assertEqual([(self.start, 30.0), (self.start + 86400, 31.0), (self.start + 2 * 86400, 32.0)],
+                         history.price_series("B084DWG2VQ", "linux"))
+        self.assertEqual([(self.start + 86400, 31.0)],
+                         history.price_series("B084DWG2VQ", "linux", start=self.start + 1, end=self.start + 86400))
+        self.assertEqual(self.record._replace(timestamp=self.start + 2 * 86400, current_price=32.0),
+                         history.latest("B084DWG2VQ", "linux"))
+        self.assertEqual({"linux": (self.start + 2 * 86400, 32.0), "iphone": (self.start, 35.0)},
+                         history.latest_prices("B084DWG2VQ"))
+        self.assertIsNone(history.latest("B07SF1LZ9Q", "linux"))
+        plan = history.connection.execute(
+            "EXPLAIN QUERY PLAN SELECT timestamp FROM products WHERE asin = ? AND client = ? ORDER BY timestamp",
+            ("B084DWG2VQ", "linux")).fetchall()
+        self.assertIn("products_asin_client_timestamp", str(plan))
+        history.close()
+
+    def test_create_sink_with_sqlite_format(self):
+        """The sqlite format of the settings selects the SqliteSink"""
+        settings = {"aws_env": False, "client": "linux", "storage": {"format": "sqlite", "sqlite_path": self.path}}
+        sink = create_sink(settings)
+        self.assertIsInstance(sink, SqliteSink)
+        sink.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
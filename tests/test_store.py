@@ -1,31 +1,33 @@
-from persistence.store import store_to_csv
+from datetime import datetime
+from persistence.store import CsvFileSink, store_to_csv, store_batch_to_csv
+from item_factory.product_record import ProductBatch, ProductRecord
 import unittest
 import os
 
 
 class TestStore(unittest.TestCase):
+    def setUp(self):
+        self.sample_product = ProductRecord(
+            timestamp=datetime(2022, 5, 9, 20, 6, 56, 320101).timestamp(),
+            name='"Echo Dot (4. Generation) | Smarter Lautsprecher mit Alexa" | Anthrazit',
+            discount_in_euros=29.99,
+            price_regular=59.99,
+            prime=False,
+            sold_by_amazon=True,
+            seller='amazon',
+            asin='B084DWG2VQ',
+            url='https://www.amazon.de/der-neue-echo-dot-4-generation-smarter-lautsprecher-mit-alexa-anthrazit/dp/B084DWG2VQ',
+            current_price=12345.0,
+            percent_discount=45.0,
+            amazon_choice=False)
+        self.expected_string = str(self.sample_product.timestamp) + ",2022-05-09,20:06:56,Echo Dot (4. Generation) | Smarter Lautsprecher mit Alexa | Anthrazit,12345.0,59.99,False,29.99,45.0,True,amazon,False,B084DWG2VQ,https://www.amazon.de/der-neue-echo-dot-4-generation-smarter-lautsprecher-mit-alexa-anthrazit/dp/B084DWG2VQ"
+
     def test_store_to_csv(self):
         """Tests the store_to_csv method of the persistence module. Stores given productinformation into a file
          and checks if the written data matches the excepted values"""
 
-        sample_product = {'name': '"Echo Dot (4. Generation) | Smarter Lautsprecher mit Alexa" | Anthrazit',
-                       'discount_in_euros': 29.99,
-                       'price_regular': 59.99,
-                       'prime': False,
-                       'sold_by_amazon': True,
-                       'seller': 'amazon',
-                       'asin': 'B084DWG2VQ',
-                       'url': 'https://www.amazon.de/der-neue-echo-dot-4-generation-smarter-lautsprecher-mit-alexa-anthrazit/dp/B084DWG2VQ',
-                       'timestamp': '1652119616.320101',
-                       'date': '2022-05-09',
-                       'time': '20:06:56',
-                       'current_price': '12345',
-                       'percent_discount': '45%',
-                       'amazon_choice': False}
-
-
         filepath = 'testCSV.csv'
-        store_to_csv(sample_product, filepath)
+        store_to_csv(self.sample_product, filepath)
         last_line = ""
         with open(filepath, newline='', encoding='utf-8') as f:
             last_line = f.readlines()[-1]
@@ -35,8 +37,43 @@ class TestStore(unittest.TestCase):
         # removing the created file so there is no dead weight in the module directories
         os.remove(filepath)
 
-        expected_string = "1652119616.320101,2022-05-09,20:06:56,Echo Dot (4. Generation) | Smarter Lautsprecher mit Alexa | Anthrazit,12345,59.99,False,29.99,45%,True,amazon,False,B084DWG2VQ,https://www.amazon.de/der-neue-echo-dot-4-generation-smarter-lautsprecher-mit-alexa-anthrazit/dp/B084DWG2VQ"
-
         # Need to append other rows/ lines if tested differently
-        self.assertEqual(expected_string.rstrip(), last_line.rstrip(), 'The last line does not match with expected result')
+        self.assertEqual(self.expected_string.rstrip(), last_line.rstrip(), 'The last line does not match with expected result')
+
+    def test_store_batch_to_csv(self):
+        """Stores a batch of two records and checks that the header is written once followed by both rows"""
+
+        filepath = 'testCSV.csv'
+        store_batch_to_csv(ProductBatch([self.sample_product, self.sample_product]), filepath)
+        with open(filepath, newline='', encoding='utf-8') as f:
+            lines = f.readlines()
+        os.remove(filepath)
+
+        self.assertEqual(3, len(lines))
+        self.assertTrue(lines[0].startswith("timestamp,date,time,name"))
+        self.assertEqual(self.expected_string, lines[2].rstrip())
+
+    def test_csv_file_sink_flush_policy(self):
+        """The csv sink buffers rows until flush_rows is reached, writes the header only once and writes the rest
+        of the buffer on close"""
+
+        filepath = 'testCSV.csv'
+        sink = CsvFileSink(filepath, flush_rows=2, flush_interval=3600)
+        sink.write(self.sample_product)
+        self.assertFalse(os.path.exists(filepath))
+        sink.write(self.sample_product)
+        with open(filepath, newline='', encoding='utf-8') as f:
+            self.assertEqual(3, len(f.readlines()))
+        sink.write(self.sample_product)
+        sink.close()
+
+        sink = CsvFileSink(filepath, flush_rows=100, flush_interval=3600)
+        sink.write(self.sample_product)
+        sink.close()
+        with open(filepath, newline='', encoding='utf-8') as f:
+            lines = f.readlines()
+        os.remove(filepath)
 
+        self.assertEqual(5, len(lines))
+        self.assertEqual(1, sum(line.startswith("timestamp") for line in lines))
+        self.assertEqual(self.expected_string, lines[-1].rstrip())